@@ -0,0 +1,121 @@
+"""Grouped weather statistics computed by the database instead of in Python.
+
+SupabaseAggregator calls the Postgres functions in sql/weather_aggregates.sql.
+SQLiteAggregator runs the same queries on a local SQLite database so the
+aggregation API can be used and tested offline.
+"""
+import math
+import sqlite3
+from metrics import execute
+
+BUCKETS = ("day", "week", "month", "all")
+
+
+def _check_bucket(bucket):
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(BUCKETS)}, got {bucket!r}")
+
+
+class SupabaseAggregator:
+    def __init__(self, client):
+        self.client = client
+
+    def aggregate(self, locality_id, since, bucket="day"):
+        _check_bucket(bucket)
+        result = execute(self.client.rpc("weather_aggregate", {
+            "p_locality_id": locality_id,
+            "p_since": str(since),
+            "p_bucket": bucket
+        }))
+        return result.data
+
+    def condition_histogram(self, locality_id, since):
+        result = execute(self.client.rpc("weather_condition_histogram", {
+            "p_locality_id": locality_id,
+            "p_since": str(since)
+        }))
+        return {r["description"]: r["records"] for r in result.data}
+
+
+class _StddevSamp:
+    """SQLite aggregate matching Postgres stddev_samp (Welford's algorithm)."""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def step(self, value):
+        if value is None:
+            return
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (value - self.mean)
+
+    def finalize(self):
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else None
+
+
+# SQLite equivalents of date_trunc(); weeks start on Monday like Postgres
+_SQLITE_BUCKET_EXPR = {
+    "day": "date(measurement_date)",
+    "week": "date(measurement_date, '-6 days', 'weekday 1')",
+    "month": "strftime('%Y-%m-01', measurement_date)",
+    "all": ":since",
+}
+
+
+class SQLiteAggregator:
+    """Offline stand-in for the Postgres aggregation functions."""
+
+    def __init__(self, path=":memory:"):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.create_aggregate("stddev_samp", 1, _StddevSamp)
+        self.conn.executescript("""
+            create table if not exists weather_data (
+                weather_id integer primary key autoincrement,
+                locality_id integer not null,
+                temperature real,
+                humidity real,
+                description text,
+                wind_speed real,
+                measurement_date text not null
+            );
+            create index if not exists weather_data_locality_date_idx
+                on weather_data (locality_id, measurement_date);
+        """)
+
+    def insert_rows(self, rows):
+        self.conn.executemany(
+            "insert into weather_data (locality_id, temperature, humidity, description, wind_speed, measurement_date) "
+            "values (:locality_id, :temperature, :humidity, :description, :wind_speed, :measurement_date)",
+            [{"temperature": None, "humidity": None, "wind_speed": None, "description": None, **r} for r in rows]
+        )
+        self.conn.commit()
+
+    def aggregate(self, locality_id, since, bucket="day"):
+        _check_bucket(bucket)
+        stats = []
+        for col, prefix in (("temperature", "temp"), ("humidity", "hum"), ("wind_speed", "wind")):
+            stats.append(
+                f"round(avg({col}), 2) as {prefix}_avg, min({col}) as {prefix}_min, max({col}) as {prefix}_max, "
+                f"round(coalesce(stddev_samp({col}), 0), 2) as {prefix}_std"
+            )
+        query = (
+            f"select {_SQLITE_BUCKET_EXPR[bucket]} as bucket, count(*) as records, {', '.join(stats)} "
+            "from weather_data where locality_id = :locality_id and measurement_date >= :since "
+            "group by 1 order by 1"
+        )
+        rows = self.conn.execute(query, {"locality_id": locality_id, "since": str(since)}).fetchall()
+        return [dict(r) for r in rows]
+
+    def condition_histogram(self, locality_id, since):
+        rows = self.conn.execute(
+            "select description, count(*) as records from weather_data "
+            "where locality_id = ? and measurement_date >= ? and description is not null and description <> '' "
+            "group by description order by records desc",
+            (locality_id, str(since))
+        ).fetchall()
+        return {r["description"]: r["records"] for r in rows}
@@ -0,0 +1,89 @@
+from collections import Counter
+import numpy as np
+from records import as_batch
+
+
+def to_columns(records):
+    """Float64 measurement columns (NaN for missing), datetime64 dates and condition counts of a batch or list of rows."""
+    batch = as_batch(records)
+    return {
+        "temperature": batch.values("temperature"),
+        "humidity": batch.values("humidity"),
+        "wind_speed": batch.values("wind_speed"),
+        "dates": batch.measurement_date,
+        "conditions": Counter(d for d in batch.description if d),
+    }
+
+
+def _num(value):
+    # plain Python numbers keep the analysis dict JSON friendly
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+def series_stats(values):
+    """Avg/min/max/range/sample stddev of an array, ignoring NaNs."""
+    valid = values[~np.isnan(values)]
+    if valid.size == 0:
+        return {"avg": None, "min": None, "max": None, "range": None, "std": 0, "count": 0}
+    lo, hi = valid.min(), valid.max()
+    return {
+        "avg": round(float(valid.mean()), 2),
+        "min": _num(lo),
+        "max": _num(hi),
+        "range": round(float(hi - lo), 2),
+        "std": round(float(valid.std(ddof=1)), 2) if valid.size > 1 else 0,
+        "count": int(valid.size)
+    }
+
+
+def analyze_records(records):
+    """Compute the trend summary returned by SupabaseDB.analyze_weather."""
+    if not records:
+        return None
+
+    batch = as_batch(records)
+    cols = to_columns(batch)
+    temps, hums = cols["temperature"], cols["humidity"]
+    temp, hum, wind = series_stats(temps), series_stats(hums), series_stats(cols["wind_speed"])
+
+    valid_temps = temps[~np.isnan(temps)]
+    if valid_temps.size:
+        first, last = valid_temps[0], valid_temps[-1]
+        temp_trend = "Increasing" if last > first else "Decreasing" if last < first else "Stable"
+    else:
+        temp_trend = None
+
+    # NaN compares False, so missing values never count as extreme
+    with np.errstate(invalid="ignore"):
+        extreme_temp = (temps > 35) | (temps < 5)
+        extreme_hum = (hums > 90) | (hums < 20)
+    conditions = cols["conditions"]
+
+    return {
+        "records": len(batch),
+        # Temperature
+        "temp_avg": temp["avg"],
+        "temp_min": temp["min"],
+        "temp_max": temp["max"],
+        "temp_range": temp["range"],
+        "temp_std": temp["std"],
+        "temp_trend": temp_trend,
+        # Humidity
+        "hum_avg": hum["avg"],
+        "hum_min": hum["min"],
+        "hum_max": hum["max"],
+        "hum_range": hum["range"],
+        "hum_std": hum["std"],
+        # Wind
+        "wind_avg": wind["avg"],
+        "wind_min": wind["min"],
+        "wind_max": wind["max"],
+        "wind_std": wind["std"],
+        # Conditions
+        "most_common_condition": conditions.most_common(1)[0][0] if conditions else None,
+        "condition_counts": dict(conditions),
+        # Extremes
+        "extreme_temp_days": batch.date_strings(extreme_temp).tolist(),
+        "extreme_hum_days": batch.date_strings(extreme_hum).tolist()
+    }
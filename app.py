@@ -1,41 +1,53 @@
+import argparse
+import sys
+from datetime import datetime
 from supabase_client import SupabaseDB
-from weather_api import WeatherAPI
-from utils import analyze_and_plot_weather
-import datetime
-from datetime import datetime, timedelta
-import pandas as pd
+from weather_api import WeatherAPI, is_simulated
+
+# Charting (matplotlib/streamlit), analytics (numpy) and the async client (httpx) are
+# imported inside the menu options that use them, so the menu and `fetch` start fast.
 
 class WeatherApp:
     def __init__(self):
         self.db = SupabaseDB()
 
-    def fetch_and_store(self):
-        name = input("Enter locality name: ").strip()
+    def _did_you_mean(self, name):
+        suggestions = self.db.suggest_localities(name)
+        return f" Did you mean {', '.join(suggestions)}?" if suggestions else ""
+
+    def fetch_and_store(self, name=None):
+        if name is None:
+            name = input("Enter locality name: ").strip()
         locality = self.db.get_locality_by_name(name)
 
         # Step 1: If locality not in DB, fetch coordinates from API
         if not locality:
-            print(f"ℹ️ Locality '{name}' not found in DB. Trying to fetch from API...")
+            print(f"ℹ️ Locality '{name}' not found in DB.{self._did_you_mean(name)} Trying to fetch from API...")
             coords = self.db.get_coordinates_from_api(name)
             if coords:
-                self.db.insert_locality(name, coords["latitude"], coords["longitude"])
-                locality = self.db.get_locality_by_name(name)
-                print(f"✅ Added new locality: {name}")
-            else:
+                locality = self.db.insert_locality(name, coords["latitude"], coords["longitude"])
+                if locality and locality["locality_name"] != name:
+                    print(f"ℹ️ '{name}' is at the same place as '{locality['locality_name']}'; using it.")
+                elif locality:
+                    print(f"✅ Added new locality: {name}")
+            if not locality:
                 print("❌ Could not fetch locality. Aborting.")
-                return
+                return False
 
         print(f"✅ Found locality: {locality['locality_name']} (City ID: {locality['locality_id']})")
 
         # Step 2: Fetch weather for the locality
         try:
-            temperature, humidity, condition, wind = WeatherAPI.get_weather(
-                locality["latitude"], locality["longitude"]
-            )
+            reading = WeatherAPI.get_weather(locality["latitude"], locality["longitude"])
+            temperature, humidity, condition, wind = reading
             print(f"🌤️ {condition} | 🌡️ {temperature}°C | 💨 {wind} kmph |💧 {humidity}%")
         except Exception as e:
             print(f"⚠️ Error fetching weather: {e}")
-            temperature, humidity, condition, wind = None, None, None, None
+            return False
+
+        if is_simulated(reading):
+            print("⚠️ WeatherAPI is unavailable, these are simulated values. Not storing them.")
+            return False
 
         # Step 3: Insert weather data into DB (include wind_speed)
         self.db.insert_weather(
@@ -47,51 +59,65 @@ class WeatherApp:
         )
 
         print("Weather data stored successfully.")
+        return True
 
-    def view_history(self):
-        name = input("Enter locality name: ").strip()
+    def view_history(self, name=None, days=None):
+        from async_client import load_history
+
+        if name is None:
+            name = input("Enter locality name: ").strip()
         locality = self.db.get_locality_by_name(name)
 
         if not locality:
-            print("❌ Locality not found.")
-            return
+            print(f"❌ Locality not found.{self._did_you_mean(name)}")
+            return False
 
-        days_input = input("Enter number of past days to view: ").strip()
-        days = int(days_input) if days_input.isdigit() else 7
+        if days is None:
+            days_input = input("Enter number of past days to view: ").strip()
+            days = int(days_input) if days_input.isdigit() else 7
 
-        data = self.db.get_last_n_days(locality["locality_id"], days=days)
+        data = load_history(self.db, locality["locality_id"], days=days)
         print(f"Last {days} days history for {locality['locality_name']}:")
 
         for row in data:
-            # convert to datetime if it's string
-            date_val = row["measurement_date"]
-            if isinstance(date_val, str):
-                try:
-                    date_val = datetime.fromisoformat(date_val)
-                except ValueError:
-                    # fallback: just keep as string
-                    date_val = date_val.split("T")[0]
-            
-            print(f"{date_val if isinstance(date_val, str) else date_val.strftime('%Y-%m-%d %H:%M')} | "
-                f"{row['temperature']}°C | {row['humidity']}% | {row['wind_speed']} kmph | {row['description']}")
+            when = row.measurement_date
+            stamp = when.strftime('%Y-%m-%d %H:%M') if isinstance(when, datetime) else when.isoformat()
+            print(f"{stamp} | {row.temperature}°C | {row.humidity}% | {row.wind_speed} kmph | {row.description}")
+        return True
+
+    def nearby(self, latitude, longitude, radius_km=25.0):
+        found = self.db.localities_within(latitude, longitude, radius_km)
+        if not found:
+            nearest = self.db.nearest_locality(latitude, longitude)
+            hint = f" Nearest is {nearest[0]['locality_name']} ({nearest[1]:.1f} km)." if nearest else ""
+            print(f"❌ No localities within {radius_km:g} km.{hint}")
+            return False
+        for locality, distance in found:
+            print(f"📍 {locality['locality_name']} (City ID: {locality['locality_id']}) — {distance:.1f} km")
+        return True
 
     def analyze_trends(self):
+        from async_client import load_history
+        from utils import analyze_and_plot_weather
+
         name = input("Enter locality name: ").strip()
         locality = self.db.get_locality_by_name(name)
 
         if not locality:
-            print("❌ Locality not found.")
+            print(f"❌ Locality not found.{self._did_you_mean(name)}")
             return
 
-        records = self.db.get_last_n_days(locality["locality_id"], days=7)
+        records = load_history(self.db, locality["locality_id"], days=7)
         analyze_and_plot_weather(records, locality["locality_name"])
 
     def export_csv(self):
+        from export import export_history
+
         name = input("Enter locality name: ").strip()
         locality = self.db.get_locality_by_name(name)
 
         if not locality:
-            print("❌ Locality not found.")
+            print(f"❌ Locality not found.{self._did_you_mean(name)}")
             return
 
         days_input = input("Enter number of past days to export (default 7): ").strip()
@@ -99,36 +125,53 @@ class WeatherApp:
 
         filename = f"{locality['locality_name']}_history.csv"
 
-        # Fetch records
-        records = self.db.get_last_n_days(locality["locality_id"], days=days)
-        if not records:
+        # Fill gaps first, then stream rows page by page straight into the file
+        self.db.fill_missing_days(locality["locality_id"], days)
+        count = export_history(self.db, [locality["locality_id"]], days, filename)
+        if not count:
             print("❌ No records found to export.")
             return
 
-        df = pd.DataFrame(records)
-
-        # Clean date format
-        df["measurement_date"] = pd.to_datetime(df["measurement_date"], errors="coerce")
-        df["measurement_date"] = df["measurement_date"].dt.strftime("%Y-%m-%d")
-
-        # summary rows
-        avg_row = df.mean(numeric_only=True)
-        avg_row["measurement_date"] = "Average"
-
-        min_row = df.min(numeric_only=True)
-        min_row["measurement_date"] = "Minimum"
-
-        max_row = df.max(numeric_only=True)
-        max_row["measurement_date"] = "Maximum"
-
-        # Keep description empty for summary rows
-        for row in [avg_row, min_row, max_row]:
-            row["description"] = ""
+        print(f"📂 Exported {count} records + summary → {filename}")
+
+    def compare_localities(self):
+        from fleet import analyze_fleet
+
+        names = input("Enter locality names (comma separated, blank for all): ").strip()
+        if names:
+            found = [(n, self.db.get_locality_by_name(n)) for n in (n.strip() for n in names.split(",")) if n]
+            missing = [n for n, loc in found if not loc]
+            if missing:
+                print(f"❌ Locality not found: {', '.join(missing)}")
+            # two names can resolve to the same locality
+            localities = list({loc["locality_id"]: loc for _, loc in found if loc}.values())
+        else:
+            localities = self.db.get_localities()
+        if len(localities) < 2:
+            print("❌ Need at least two localities to compare.")
+            return
 
-        df = pd.concat([df, pd.DataFrame([avg_row, min_row, max_row])], ignore_index=True)
+        days_input = input("Enter number of past days to compare (default 7): ").strip()
+        days = int(days_input) if days_input.isdigit() else 7
 
-        df.to_csv(filename, index=False)
-        print(f"📂 Exported {len(records)} records + summary → {filename}")
+        result = analyze_fleet(self.db, [loc["locality_id"] for loc in localities], days=days)
+        print(f"\n🏆 Average temperature ranking (last {days} days):")
+        for r in result["ranking"]:
+            avg = f"{r['avg']}°C" if r["avg"] is not None else "no data"
+            print(f"{r['rank']:>3}. {r['locality_name']} — {avg}")
+
+        if result["anomalies"]:
+            print("\n⚠️ Anomalies vs fleet mean:")
+            for a in result["anomalies"]:
+                print(f"{a['date']} | {a['locality_name']} | {a['value']}°C vs fleet {a['fleet_mean']}°C (z={a['z']})")
+        else:
+            print("\n✅ No anomalies against the fleet mean.")
+
+        print("\n🔗 Temperature correlation:")
+        labels = [name[:10] for name in result["localities"]]
+        print(" " * 11 + " ".join(f"{l:>10}" for l in labels))
+        for label, row in zip(labels, result["correlation"]):
+            print(f"{label:>10} " + " ".join(f"{v:>10.2f}" if v is not None else f"{'–':>10}" for v in row))
 
     def run(self):
         while True:
@@ -137,7 +180,8 @@ class WeatherApp:
             print("2. View Last 7 Days History")
             print("3. Analyze Weather Trends")
             print("4. Export History to CSV")
-            print("5. Exit")
+            print("5. Compare Localities")
+            print("6. Exit")
 
             choice = input("Enter choice: ").strip()
 
@@ -150,12 +194,38 @@ class WeatherApp:
             elif choice == "4":
                 self.export_csv()
             elif choice == "5":
+                self.compare_localities()
+            elif choice == "6":
                 print("👋 Exiting...")
                 break
             else:
                 print("❌ Invalid choice. Try again.")
 
-if __name__ == "__main__":
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Weather Insight & Analysis System. Without a command, opens the menu.")
+    commands = parser.add_subparsers(dest="command")
+    fetch = commands.add_parser("fetch", help="fetch and store current weather (for cron)")
+    fetch.add_argument("--locality", action="append", required=True, help="locality name; repeat for several")
+    near = commands.add_parser("near", help="list stored localities around a point")
+    near.add_argument("--lat", type=float, required=True)
+    near.add_argument("--lon", type=float, required=True)
+    near.add_argument("--radius", type=float, default=25.0, help="km (default 25)")
+    history = commands.add_parser("history", help="print the last N days for a locality")
+    history.add_argument("--locality", required=True)
+    history.add_argument("--days", type=int, default=7)
+    args = parser.parse_args(argv)
+
     app = WeatherApp()
+    if args.command == "fetch":
+        ok = [app.fetch_and_store(name.strip()) for name in args.locality]
+        return 0 if all(ok) else 1
+    if args.command == "near":
+        return 0 if app.nearby(args.lat, args.lon, args.radius) else 1
+    if args.command == "history":
+        return 0 if app.view_history(args.locality.strip(), args.days) else 1
     app.run()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
 
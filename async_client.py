@@ -0,0 +1,241 @@
+"""Asyncio client layer over SupabaseDB and WeatherAPI.
+
+Independent I/O behind one request runs concurrently: the locality lookup and
+the stored-range query overlap, and missing days are fetched with httpx over a
+shared async connection pool. Supabase calls reuse the SupabaseDB methods
+(local tier, locality index, rolling stats) on worker threads.
+
+Sync callers (WeatherApp, Streamlit) use load_history(), which runs the async
+path on a background event loop when ASYNC_IO=1.
+"""
+import asyncio
+import importlib.util
+import threading
+import time
+from config import WEATHER_API_KEY, HTTP_TIMEOUT, HTTP_POOL_MAXSIZE, HTTP_MAX_RETRIES, BACKFILL_CONCURRENCY, ASYNC_IO
+from weather_api import WeatherAPI, SimulatedReading, is_simulated, simulated_reading, simulated_day
+from metrics import metrics
+from gap_planner import short_days
+
+
+async def _timed(op, coro):
+    # spans keep a per-thread stack, which interleaving coroutines would corrupt; record flat timings instead
+    if not metrics.enabled:
+        return await coro
+    start = time.perf_counter()
+    error = False
+    try:
+        return await coro
+    except Exception:
+        error = True
+        raise
+    finally:
+        metrics.record(op, time.perf_counter() - start, error=error)
+
+
+class AsyncWeatherAPI:
+    """Async counterpart of WeatherAPI; shares its caches and response parsing."""
+
+    def __init__(self, timeout=HTTP_TIMEOUT, max_connections=HTTP_POOL_MAXSIZE, retries=HTTP_MAX_RETRIES):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.retries = retries
+        self._client = None
+
+    @property
+    def client(self):
+        # created on first use so it binds to the loop that runs it
+        if self._client is None:
+            import httpx  # only loaded when the async path is used (ASYNC_IO=1)
+
+            limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                transport=httpx.AsyncHTTPTransport(retries=self.retries, limits=limits)
+            )
+        return self._client
+
+    async def _request(self, endpoint, q, **params):
+        # same rate limiter and circuit breaker as the sync WeatherAPI
+        params = {"key": WEATHER_API_KEY, "q": q, **params}
+        for attempt in range(2):
+            WeatherAPI.breaker.before_call()
+            wait = WeatherAPI.limiter.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                response = await self.client.get(WeatherAPI._url(endpoint), params=params)
+            except Exception:
+                WeatherAPI.breaker.record_failure()
+                raise
+            if metrics.enabled:
+                metrics.record("http.async_get", response.elapsed.total_seconds(), nbytes=len(response.content))
+            if response.status_code >= 400:
+                if WeatherAPI._on_error_status(response.status_code, response.headers) and attempt == 0:
+                    continue
+                response.raise_for_status()
+            try:
+                data = response.json()
+            except ValueError:
+                WeatherAPI.breaker.record_failure()
+                raise
+            WeatherAPI.breaker.record_success()
+            WeatherAPI.limiter.on_success()
+            return data
+
+    async def get_weather(self, latitude, longitude):
+        key = WeatherAPI._coord_key(latitude, longitude)
+        cached = WeatherAPI.current_cache.get(key)
+        if cached is not None:
+            return cached
+        try:
+            data = await _timed("api.async.get_weather", self._request("current", f"{latitude},{longitude}"))
+            reading = WeatherAPI._parse_current(data)
+            WeatherAPI.current_cache.set(key, reading)
+            return reading
+        except Exception as e:
+            print(f"API failed: {e}, using simulated data.")
+            return simulated_reading()
+
+    async def get_historical_day(self, latitude, longitude, date):
+        key = WeatherAPI._history_key(latitude, longitude, date)
+        cached = WeatherAPI.history_cache.get(key)
+        if cached is not None:
+            return cached
+        try:
+            data = await _timed("api.async.get_historical_weather",
+                                self._request("history", f"{latitude},{longitude}", dt=date))
+            result = WeatherAPI._parse_history(data)
+            WeatherAPI.history_cache.set(key, result, ttl=WeatherAPI._history_ttl(date))
+            return result
+        except Exception as e:
+            print(f"⚠️ Failed to fetch historical data for {date}: {e}")
+            return simulated_day()
+
+    async def get_historical_range(self, latitude, longitude, start, end):
+        keys, cached = WeatherAPI._cached_range(latitude, longitude, start, end)
+        if cached is not None:
+            return cached
+        data = await _timed("api.async.get_historical_range",
+                            self._request("history", f"{latitude},{longitude}", **WeatherAPI._range_params(start, end)))
+        return WeatherAPI._cache_forecastdays(data, keys)
+
+    async def get_historical_weather(self, latitude, longitude, date):
+        day = await self.get_historical_day(latitude, longitude, date)
+        return SimulatedReading(day[:4]) if is_simulated(day) else day[:4]
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class AsyncWeatherClient:
+    """Async history/ingest operations for one SupabaseDB."""
+
+    def __init__(self, db, api=None, concurrency=BACKFILL_CONCURRENCY):
+        self.db = db
+        self.api = api or AsyncWeatherAPI()
+        self.concurrency = concurrency
+
+    async def get_weather(self, latitude, longitude):
+        return await self.api.get_weather(latitude, longitude)
+
+    async def get_historical_weather(self, latitude, longitude, date):
+        return await self.api.get_historical_weather(latitude, longitude, date)
+
+    async def insert_weather(self, locality_id, temperature, humidity, description, wind_speed=None, measurement_date=None):
+        await asyncio.to_thread(self.db.insert_weather, locality_id, temperature, humidity, description,
+                                wind_speed=wind_speed, measurement_date=measurement_date)
+
+    async def get_last_n_days(self, locality_id, days=7, resolution="daily", concurrency=None):
+        db = self.db
+        window = db._window(days)
+        # The locality lookup and the stored-range query don't depend on each other
+        locality, existing_dates = await asyncio.gather(
+            asyncio.to_thread(db.get_locality_by_id, locality_id),
+            asyncio.to_thread(db.stored_days, locality_id, window)
+        )
+        if not locality:
+            return []
+
+        missing_days = [day for day in window if day not in existing_dates]
+        backfilled = []
+        ranges = await asyncio.to_thread(db._plan_backfill, locality_id, missing_days) if missing_days else []
+        if ranges:
+            limit = asyncio.Semaphore(concurrency or self.concurrency)
+
+            async def fetch(span):
+                async with limit:
+                    try:
+                        return span, await self.api.get_historical_range(
+                            locality["latitude"], locality["longitude"], *span
+                        ), None
+                    except Exception as e:
+                        return span, {}, e
+
+            outcomes = await asyncio.gather(*(fetch(span) for span in ranges))
+            # Days a range call came back without are confirmed (or not) with single-day calls
+            outcomes += await asyncio.gather(*(fetch((day, day)) for day in short_days(outcomes)))
+            fetched = await asyncio.to_thread(db._collect_ranges, locality_id, outcomes)
+            backfilled = await asyncio.to_thread(db.store_backfill, locality, fetched)
+
+        return await asyncio.to_thread(db._assemble, locality_id, days, window, existing_dates, backfilled, resolution)
+
+    async def aclose(self):
+        await self.api.aclose()
+
+
+class _LoopThread:
+    """A private event loop on a daemon thread, so sync code can run coroutines on long-lived clients."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="async-client-loop", daemon=True)
+        self.thread.start()
+
+    def run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+
+_runner = None
+_clients = {}
+_runner_lock = threading.Lock()
+
+
+def run_sync(coro):
+    """Run a coroutine on the shared background loop and wait for its result."""
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                _runner = _LoopThread()
+    return _runner.run(coro)
+
+
+def client_for(db):
+    """The AsyncWeatherClient bound to db (one per SupabaseDB, reusing its connection pool)."""
+    with _runner_lock:
+        client = _clients.get(id(db))
+        if client is None or client.db is not db:
+            client = _clients[id(db)] = AsyncWeatherClient(db)
+    return client
+
+
+_httpx_missing = None  # checked on first use, without importing httpx
+
+
+def _async_available():
+    global _httpx_missing
+    if _httpx_missing is None:
+        _httpx_missing = importlib.util.find_spec("httpx") is None
+        if _httpx_missing:
+            print("⚠️ ASYNC_IO is set but httpx is not installed (pip install httpx); using the sync path.")
+    return not _httpx_missing
+
+
+def load_history(db, locality_id, days=7, resolution="daily"):
+    """Sync entry point for the front-ends: async path when ASYNC_IO is on and httpx is installed, SupabaseDB otherwise."""
+    if not ASYNC_IO or not _async_available():
+        return db.get_last_n_days(locality_id, days=days, resolution=resolution)
+    return run_sync(client_for(db).get_last_n_days(locality_id, days=days, resolution=resolution))
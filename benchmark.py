@@ -0,0 +1,400 @@
+"""Offline performance benchmarks. Run `python benchmark.py <name>`."""
+import argparse
+import io
+import json
+import os
+import random
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+import requests
+from http_client import HTTPTransport
+from metrics import Metrics, _percentile
+from stub_servers import StubServer, PostgRESTStubHandler
+
+
+def bench_transport(calls=200, handshake_delay=0.005):
+    """Repeated WeatherAPI-style calls: bare requests.get vs the pooled transport."""
+    with StubServer(handshake_delay=handshake_delay) as server:
+        url = f"{server.url}/v1/current.json"
+        params = {"key": "bench", "q": "12.97,77.59"}
+
+        start = time.perf_counter()
+        for _ in range(calls):
+            response = requests.get(url, params=params, timeout=5)
+            response.raise_for_status()
+            response.json()
+        bare = time.perf_counter() - start
+
+        transport = HTTPTransport()
+        start = time.perf_counter()
+        for _ in range(calls):
+            transport.get_json(url, params=params)
+        pooled = time.perf_counter() - start
+        transport.close()
+
+    print(f"{calls} calls (simulated handshake {handshake_delay * 1000:.1f} ms)")
+    print(f"  requests.get   : {bare:.3f}s  ({bare / calls * 1000:.2f} ms/call)")
+    print(f"  HTTPTransport  : {pooled:.3f}s  ({pooled / calls * 1000:.2f} ms/call)")
+    print(f"  speedup        : {bare / pooled:.1f}x")
+    return {"bare_s": bare, "pooled_s": pooled}
+
+
+def bench_metrics_overhead(calls=200_000):
+    """Per-call cost of an instrumented function with tracing disabled and enabled."""
+    registry = Metrics(enabled=False)
+
+    def work(x):
+        return x + 1
+
+    traced = registry.timed("bench.work")(work)
+    results = {}
+    for label, fn, enabled in (("bare", work, False), ("disabled", traced, False), ("enabled", traced, True)):
+        registry.enabled = enabled
+        start = time.perf_counter()
+        for i in range(calls):
+            fn(i)
+        results[label] = (time.perf_counter() - start) / calls * 1e9
+        print(f"  {label:<9}: {results[label]:.0f} ns/call")
+    return results
+
+
+def _stub_db(supabase_url, weather_url, localities=0):
+    """A SupabaseDB wired to the stub servers, with the local tier, rolling stats and the API rate limit off."""
+    from supabase import create_client
+    import supabase_client
+    import weather_api
+    from ratelimit import AdaptiveRateLimiter
+    from circuit_breaker import CircuitBreaker
+    from gap_planner import UnavailableRanges
+
+    weather_api.WEATHER_API_URL = f"{weather_url}/v1/current.json"
+    weather_api.WeatherAPI.clear_cache()
+    weather_api.WeatherAPI.limiter = AdaptiveRateLimiter(1e6)
+    weather_api.WeatherAPI.breaker = CircuitBreaker("api", failure_threshold=5, reset_timeout=1.0)
+    original = supabase_client.get_supabase_client
+    supabase_client.get_supabase_client = lambda: create_client(supabase_url, "bench-key")
+    try:
+        db = supabase_client.SupabaseDB()
+        db.client  # connect now, while get_supabase_client points at the stub
+    finally:
+        supabase_client.get_supabase_client = original
+    db.store = None
+    db.unavailable = UnavailableRanges()  # not the local store's: runs must not see each other's gaps
+    db.rolling = None
+    for i in range(localities):
+        db.insert_locality(f"Bench City {i}", 10 + i * 0.5, 70 + i * 0.5)
+    return db
+
+
+def bench_async(localities=5, days=30, db_latency=0.02, api_latency=0.05):
+    """Cold history windows: sync SupabaseDB path vs the asyncio client, against stub servers."""
+    import asyncio
+    from async_client import AsyncWeatherClient, run_sync
+    from weather_api import WeatherAPI
+
+    results = {}
+    with StubServer(PostgRESTStubHandler, latency=db_latency) as supa, StubServer(latency=api_latency) as api:
+        db = _stub_db(supa.url, api.url, localities=localities)
+        ids = [loc["locality_id"] for loc in db.get_localities()]
+
+        def reset():
+            supa.tables["weather_data"] = []
+            WeatherAPI.clear_cache()
+
+        reset()
+        start = time.perf_counter()
+        for locality_id in ids:
+            db.get_last_n_days(locality_id, days=days)
+        results["sync_sequential_s"] = time.perf_counter() - start
+
+        reset()
+        client = AsyncWeatherClient(db)
+        start = time.perf_counter()
+        for locality_id in ids:
+            run_sync(client.get_last_n_days(locality_id, days=days))
+        results["async_sequential_s"] = time.perf_counter() - start
+
+        async def all_at_once():
+            return await asyncio.gather(*(client.get_last_n_days(i, days=days) for i in ids))
+
+        reset()
+        start = time.perf_counter()
+        run_sync(all_at_once())
+        results["async_gather_s"] = time.perf_counter() - start
+        run_sync(client.aclose())
+
+    print(f"{localities} localities x {days} cold days (DB {db_latency * 1000:.0f} ms, API {api_latency * 1000:.0f} ms per call)")
+    for label, value in results.items():
+        print(f"  {label:<20}: {value:.3f}s")
+    return results
+
+
+def _rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # peak, KiB on Linux
+
+
+def bench_charts(sizes=(7, 365, 10_000), renders=5):
+    """Render time and RSS: per-point annotated pyplot figures (old) vs charts.build_figure."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import numpy as np
+    from charts import build_figure
+
+    def legacy(dates, series, title):
+        # the previous utils.analyze_and_plot_weather drawing code; figures are never closed
+        fig, ax = plt.subplots(figsize=(10, 6))
+        for label, values in series.items():
+            ax.plot(dates, values, marker='o', label=label)
+            for i, v in enumerate(values):
+                ax.text(dates[i], v, f"{v:.1f}", ha='center', va='bottom', fontsize=8)
+        ax.set_xticks(range(len(dates)))
+        ax.set_xticklabels(dates, rotation=30)
+        ax.set_title(title)
+        ax.legend()
+        ax.grid(True)
+        plt.tight_layout()
+        return fig
+
+    results = {}
+    rng = np.random.default_rng(0)
+    for n in sizes:
+        dates = [f"d{i:05d}" for i in range(n)]
+        series = {
+            "Temperature (°C)": rng.uniform(15, 35, n),
+            "Humidity (%)": rng.uniform(30, 90, n),
+            "Wind Speed (kmph)": rng.uniform(0, 20, n),
+        }
+        for label, render in (("legacy", legacy), ("charts", build_figure)):
+            if label == "legacy" and n > 2000:
+                print(f"  {n:>6} pts {label:<7}: skipped (3·N text artists)")
+                continue
+            rss_before = _rss_mb()
+            start = time.perf_counter()
+            for _ in range(renders):
+                fig = render(dates, series, "bench")
+                fig.savefig(io.BytesIO(), format="png")
+                if label == "charts":
+                    fig.clear()
+            elapsed = (time.perf_counter() - start) / renders
+            rss_delta = _rss_mb() - rss_before
+            results[f"{label}_{n}"] = {"render_s": elapsed, "rss_delta_mb": rss_delta}
+            print(f"  {n:>6} pts {label:<7}: {elapsed * 1000:8.1f} ms/render  RSS +{rss_delta:.1f} MB after {renders} renders")
+        plt.close("all")
+    return results
+
+
+def _seed_history(server, locality_ids, days):
+    """Put `days` stored days per locality straight into the stub's weather_data table."""
+    rnd = random.Random(days)
+    today = datetime.now().date()
+    rows = server.tables.setdefault("weather_data", [])
+    for locality_id in locality_ids:
+        for i in range(days):
+            server.httpd.sequence += 1
+            rows.append({
+                "weather_id": server.httpd.sequence,
+                "locality_id": locality_id,
+                "measurement_date": (today - timedelta(days=days - 1 - i)).isoformat(),
+                "temperature": round(rnd.uniform(15, 35), 1),
+                "humidity": rnd.randint(30, 90),
+                "description": rnd.choice(["Sunny", "Partly cloudy", "Light rain"]),
+                "wind_speed": round(rnd.uniform(0, 20), 1),
+            })
+
+
+def _measure(run, iterations, setup=None, ops=1):
+    """Time `iterations` calls of run() (setup() before each, untimed), then one traced call for peak memory."""
+    latencies = []
+    for _ in range(iterations):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        run()
+        latencies.append(time.perf_counter() - start)
+    if setup:
+        setup()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    latencies.sort()
+    return {
+        "iterations": iterations,
+        "ops_per_iteration": ops,
+        "throughput_ops_s": round(ops * iterations / sum(latencies), 2),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+        "peak_mem_mb": round(peak / 2**20, 2),
+    }
+
+
+def _git_revision():
+    repo = os.path.dirname(os.path.abspath(__file__))
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=repo,
+                             capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=repo,
+                               capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{rev}-dirty" if dirty else rev
+
+
+def bench_suite(db_latency=0.005, api_latency=0.01, failure_rate=0.0, iterations=5, localities=10, seed=0,
+                save=None, compare=None):
+    """Scripted scenarios against stub Supabase/WeatherAPI servers: throughput, latency percentiles, peak memory.
+
+    Peak memory is the Python heap high-water mark (tracemalloc) during one run,
+    including the in-process stub servers. `save` writes the results as JSON
+    tagged with the git revision; `compare` prints the change against such a file.
+    """
+    from weather_api import WeatherAPI
+    from ingest import ingest_current_weather
+    from export import export_history
+
+    random.seed(seed)  # the simulated-weather fallback draws from the global generator
+    scenarios = {}
+    with StubServer(PostgRESTStubHandler, latency=db_latency, failure_rate=failure_rate, seed=seed) as supa, \
+            StubServer(latency=api_latency, failure_rate=failure_rate, seed=seed) as api:
+        db = _stub_db(supa.url, api.url, localities=localities)
+        ids = [loc["locality_id"] for loc in db.get_localities()]
+        first = ids[0]
+
+        def cold():
+            supa.tables["weather_data"] = []
+            WeatherAPI.clear_cache()
+
+        scenarios["history_cold_7d"] = _measure(lambda: db.get_last_n_days(first, days=7), iterations, setup=cold)
+        scenarios["history_cold_30d"] = _measure(lambda: db.get_last_n_days(first, days=30), iterations, setup=cold)
+        db.get_last_n_days(first, days=30)
+        scenarios["history_warm_7d"] = _measure(lambda: db.get_last_n_days(first, days=7), iterations)
+        scenarios["history_warm_30d"] = _measure(lambda: db.get_last_n_days(first, days=30), iterations)
+
+        scenarios["ingest_current"] = _measure(
+            lambda: ingest_current_weather(db, locality_ids=ids, rate_limit=1000), iterations,
+            setup=WeatherAPI.clear_cache, ops=len(ids)
+        )
+
+        supa.tables["weather_data"] = []
+        _seed_history(supa, ids, 3650)
+        for days in (7, 365, 3650):
+            scenarios[f"analyze_{days}d"] = _measure(lambda: db.analyze_weather(first, days=days), iterations)
+        scenarios["export_365d_csv"] = _measure(
+            lambda: export_history(db, ids, 365, io.StringIO()), iterations, ops=len(ids) * 365
+        )
+
+    result = {
+        "revision": _git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "params": {"db_latency": db_latency, "api_latency": api_latency, "failure_rate": failure_rate,
+                   "iterations": iterations, "localities": localities, "seed": seed},
+        "scenarios": scenarios,
+    }
+    print(f"revision {result['revision']} (DB {db_latency * 1000:.0f} ms, API {api_latency * 1000:.0f} ms, "
+          f"failure rate {failure_rate:.0%}, {iterations} iterations)")
+    print(f"  {'scenario':<18}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak MB':>10}")
+    for name, r in scenarios.items():
+        print(f"  {name:<18}{r['throughput_ops_s']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['peak_mem_mb']:>10}")
+
+    if compare:
+        with open(compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"vs {baseline['revision']} ({compare}):")
+        for name, r in scenarios.items():
+            old = baseline["scenarios"].get(name)
+            if not old:
+                print(f"  {name:<18} (new)")
+                continue
+            p50 = (r["p50_ms"] - old["p50_ms"]) / old["p50_ms"] * 100 if old["p50_ms"] else 0.0
+            mem = r["peak_mem_mb"] - old["peak_mem_mb"]
+            print(f"  {name:<18} p50 {p50:+6.1f}%   peak {mem:+.2f} MB")
+    if save:
+        if save is True:
+            save = os.path.join("bench_results", f"{result['revision']}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(save)), exist_ok=True)
+        with open(save, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"saved to {save}")
+    return result
+
+
+def bench_startup(runs=5, modules=("app", "ingest")):
+    """Cold-start cost: wall time of `python -c "import <module>"` in fresh interpreters, plus the slowest imports."""
+    import statistics
+    import sys
+
+    repo = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    baseline = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], cwd=repo, check=True)
+        baseline.append(time.perf_counter() - start)
+    results["interpreter_ms"] = round(statistics.median(baseline) * 1000, 1)
+    print(f"  {'interpreter':<14}: {results['interpreter_ms']:7.1f} ms")
+
+    for module in modules:
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", f"import {module}"], cwd=repo, check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            timings.append(time.perf_counter() - start)
+        # -X importtime lines: "import time: self | cumulative | <2 spaces per level>name"; keep the module's direct imports
+        trace = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=repo,
+                               capture_output=True, text=True).stderr
+        top = []
+        for line in trace.splitlines():
+            parts = line.split("|")
+            if len(parts) == 3 and parts[1].strip().isdigit() and parts[2].startswith("   ") \
+                    and not parts[2].startswith("     "):
+                top.append((int(parts[1]), parts[2].strip()))
+        top.sort(reverse=True)
+        results[module] = {"median_ms": round(statistics.median(timings) * 1000, 1),
+                           "slowest_imports_ms": {name: round(us / 1000, 1) for us, name in top[:5]}}
+        slowest = ", ".join(f"{name} {us / 1000:.0f}" for us, name in top[:3])
+        print(f"  {module:<14}: {results[module]['median_ms']:7.1f} ms  (slowest: {slowest} ms)")
+    return results
+
+
+BENCHMARKS = {
+    "transport": bench_transport,
+    "metrics": bench_metrics_overhead,
+    "charts": bench_charts,
+    "async": bench_async,
+    "suite": bench_suite,
+    "startup": bench_startup,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run offline performance benchmarks.")
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    suite = parser.add_argument_group("suite options")
+    suite.add_argument("--db-latency", type=float, default=0.005, help="seconds added to each stub Supabase request")
+    suite.add_argument("--api-latency", type=float, default=0.01, help="seconds added to each stub WeatherAPI request")
+    suite.add_argument("--failure-rate", type=float, default=0.0, help="share of stub requests answered with 503")
+    suite.add_argument("--iterations", type=int, default=5)
+    suite.add_argument("--save", nargs="?", const=True, metavar="PATH",
+                       help="write JSON results (default path: bench_results/<git revision>.json)")
+    suite.add_argument("--compare", metavar="PATH", help="print changes against a saved result file")
+    args = parser.parse_args()
+    unknown = [n for n in args.names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    for name in args.names or BENCHMARKS:
+        print(f"== {name} ==")
+        if name == "suite":
+            bench_suite(db_latency=args.db_latency, api_latency=args.api_latency, failure_rate=args.failure_rate,
+                        iterations=args.iterations, save=args.save, compare=args.compare)
+        else:
+            BENCHMARKS[name]()
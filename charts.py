@@ -0,0 +1,104 @@
+"""Chart rendering for weather series.
+
+Small windows get an annotated matplotlib figure. Above ANNOTATE_MAX_POINTS the
+per-point labels are dropped, and each series is decimated with LTTB down to
+roughly the chart's pixel width. Figures are built with the object-oriented
+API (not pyplot), so nothing is kept in pyplot's global figure registry.
+"""
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.ticker import FuncFormatter, MaxNLocator
+
+ANNOTATE_MAX_POINTS = 31   # label every point up to about a month of daily data
+CHART_MAX_POINTS = 1000    # roughly the pixel width of a wide Streamlit chart
+
+SERIES_STYLE = {
+    "Temperature (°C)": "o",
+    "Humidity (%)": "s",
+    "Wind Speed (kmph)": "^",
+}
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets downsampling. Returns the indices of the kept points."""
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)  # bucket boundaries over points 1..n-2
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        # average of the next bucket is the third triangle vertex
+        avg_x = x[end:next_end].mean() if next_end > end else x[-1]
+        avg_y = y[end:next_end].mean() if next_end > end else y[-1]
+        bx, by = x[start:end], y[start:end]
+        areas = np.abs((x[a] - avg_x) * (by - y[a]) - (x[a] - bx) * (avg_y - y[a]))
+        a = start + int(np.nanargmax(areas)) if np.isfinite(areas).any() else start
+        kept[i + 1] = a
+    return kept
+
+
+def decimate(series, max_points=CHART_MAX_POINTS):
+    """Downsample each series independently. Returns {label: (kept indices, kept values)}."""
+    out = {}
+    for label, values in series.items():
+        values = np.asarray(values, dtype=float)
+        idx = lttb(np.arange(len(values)), values, max_points)
+        out[label] = (idx, values[idx])
+    return out
+
+
+def build_figure(dates, series, title, max_points=CHART_MAX_POINTS):
+    """Line chart of the series against dates, annotated when the window is small."""
+    n = len(dates)
+    fig = Figure(figsize=(10, 6))
+    ax = fig.add_subplot()
+
+    annotate = n <= ANNOTATE_MAX_POINTS
+    # dates are categorical labels; series are plotted against their position in the window
+    for label, (idx, ys) in decimate(series, max_points).items():
+        ax.plot(idx, ys, marker=SERIES_STYLE.get(label) if annotate else None, label=label)
+        if annotate:
+            for pos, value in zip(idx, ys):
+                ax.text(pos, value, f"{value:.1f}", ha='center', va='bottom', fontsize=8)
+
+    if annotate:
+        ax.set_xticks(range(n))
+        ax.set_xticklabels(dates, rotation=30)
+    else:
+        ax.xaxis.set_major_locator(MaxNLocator(nbins=12, integer=True))
+        ax.xaxis.set_major_formatter(FuncFormatter(lambda t, _: dates[int(t)] if 0 <= t < n else ""))
+        ax.tick_params(axis="x", labelrotation=30)
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Values")
+    ax.set_title(title)
+    ax.legend()
+    ax.grid(True)
+    fig.tight_layout()
+    return fig
+
+
+def render_weather_chart(dates, series, title, max_points=CHART_MAX_POINTS):
+    """Draw the chart in Streamlit: annotated matplotlib for small windows, a Vega-Lite line chart otherwise."""
+    import streamlit as st
+
+    if len(dates) <= ANNOTATE_MAX_POINTS:
+        fig = build_figure(dates, series, title, max_points)
+        st.pyplot(fig)
+        fig.clear()  # release artists now instead of waiting for GC
+        return
+
+    import pandas as pd
+    frames = [
+        pd.DataFrame({"Date": [dates[i] for i in idx], "Value": ys, "Series": label})
+        for label, (idx, ys) in decimate(series, max_points).items()
+    ]
+    st.caption(title)
+    st.line_chart(pd.concat(frames, ignore_index=True), x="Date", y="Value", color="Series")
@@ -0,0 +1,80 @@
+"""Circuit breaker for upstream API calls.
+
+After `failure_threshold` consecutive failures the circuit opens and calls fail
+immediately with CircuitOpenError instead of each waiting out the timeout.
+Once `reset_timeout` seconds have passed one probe request is let through
+(half-open): success closes the circuit, failure opens it again.
+"""
+import threading
+import time
+from metrics import metrics
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.rejected = 0
+        self._state = CLOSED
+        self._open_until = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and time.monotonic() >= self._open_until:
+                return HALF_OPEN
+            return self._state
+
+    def _set_state(self, state):
+        self._state = state
+        metrics.set_gauge(f"{self.name}_circuit_open", int(state == OPEN))
+
+    def before_call(self):
+        """Raise CircuitOpenError unless the call may go ahead."""
+        with self._lock:
+            if self._state == OPEN:
+                if time.monotonic() < self._open_until:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"{self.name} circuit open, retrying in {self._open_until - time.monotonic():.1f}s")
+                self._set_state(HALF_OPEN)
+            if self._state == HALF_OPEN:
+                if self._probing:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"{self.name} circuit half-open, probe in flight")
+                self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            if self._state != CLOSED:
+                self._set_state(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self._open(self.reset_timeout)
+
+    def trip(self, seconds):
+        """Open the circuit for `seconds`, e.g. a long Retry-After."""
+        with self._lock:
+            self._open(seconds)
+
+    def _open(self, seconds):
+        self._open_until = max(self._open_until, time.monotonic() + seconds)
+        self._probing = False
+        self._set_state(OPEN)
+
+    def stats(self):
+        return {"state": self.state, "failures": self.failures, "rejected": self.rejected}
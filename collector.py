@@ -0,0 +1,132 @@
+"""Long-running collector that keeps weather_data populated ahead of reads.
+
+    python collector.py                 # run until SIGINT/SIGTERM
+    python collector.py --once          # one ingest pass and one gap prefill, then exit
+
+Every `interval` seconds (plus or minus `jitter`) it ingests current weather for
+every locality through ingest.ingest_current_weather. Once a night, at a random
+point in the `jitter` seconds after `backfill_hour`, it fills history gaps for
+the last `backfill_days` days of each locality. Views then find the data already
+stored instead of backfilling while the user waits.
+"""
+import argparse
+import random
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from supabase_client import SupabaseDB
+from ingest import ingest_current_weather, print_report
+from config import COLLECT_INTERVAL, COLLECT_JITTER, COLLECT_BACKFILL_HOUR, COLLECT_BACKFILL_DAYS
+from config import COLLECT_WORKERS, INGEST_RATE_LIMIT
+
+
+class Collector:
+    def __init__(self, db, interval=COLLECT_INTERVAL, jitter=COLLECT_JITTER, backfill_hour=COLLECT_BACKFILL_HOUR,
+                 backfill_days=COLLECT_BACKFILL_DAYS, workers=COLLECT_WORKERS, rate_limit=INGEST_RATE_LIMIT):
+        self.db = db
+        self.interval = interval
+        self.jitter = min(jitter, interval / 2)
+        self.backfill_hour = backfill_hour
+        self.backfill_days = backfill_days
+        self.workers = workers
+        self.rate_limit = rate_limit
+        self.stopping = threading.Event()
+
+    def stop(self, *_):
+        if not self.stopping.is_set():
+            print("🛑 Stopping after the current job...")
+        self.stopping.set()
+
+    def collect_current(self):
+        report = ingest_current_weather(self.db, concurrency=self.workers, rate_limit=self.rate_limit)
+        print_report(report)
+        return report
+
+    def prefill_gaps(self):
+        """Backfill missing days for every locality; returns the number of days filled."""
+        start = time.perf_counter()
+        localities = self.db.get_localities()
+        filled = 0
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as pool:
+            futures = {pool.submit(self.db.fill_missing_days, loc["locality_id"], self.backfill_days): loc
+                       for loc in localities}
+            for future in as_completed(futures):
+                if self.stopping.is_set():
+                    pool.shutdown(wait=True, cancel_futures=True)
+                    break
+                try:
+                    filled += future.result()
+                except Exception as e:
+                    print(f"⚠️ Gap prefill failed for locality {futures[future]['locality_id']}: {e}")
+        print(f"🗓️ Prefilled {filled} missing days across {len(localities)} localities "
+              f"in {time.perf_counter() - start:.1f}s")
+        return filled
+
+    def _next_collect(self, now):
+        return now + self.interval + random.uniform(-self.jitter, self.jitter)
+
+    def _next_backfill(self, now):
+        run = datetime.fromtimestamp(now).replace(hour=self.backfill_hour, minute=0, second=0, microsecond=0)
+        if run.timestamp() <= now:
+            run += timedelta(days=1)
+        return run.timestamp() + random.uniform(0, self.jitter)
+
+    def _run_job(self, name, job):
+        try:
+            job()
+        except Exception as e:
+            print(f"⚠️ {name} failed, will run again at the next slot: {e}")
+
+    def run(self):
+        now = time.time()
+        # Start at a random point in the first jitter window so restarted collectors don't line up
+        next_collect = now + random.uniform(0, self.jitter)
+        next_backfill = self._next_backfill(now)
+        print(f"🛰️ Collector running: current weather every {self.interval:g}s (±{self.jitter:g}s), "
+              f"gap prefill daily after {self.backfill_hour:02d}:00")
+        while not self.stopping.is_set():
+            due = min(next_collect, next_backfill)
+            if self.stopping.wait(max(0.0, due - time.time())):
+                break
+            if next_collect <= time.time():
+                self._run_job("Current weather ingest", self.collect_current)
+                next_collect = self._next_collect(time.time())
+            if next_backfill <= time.time() and not self.stopping.is_set():
+                self._run_job("Gap prefill", self.prefill_gaps)
+                next_backfill = self._next_backfill(time.time())
+        self.shutdown()
+
+    def shutdown(self):
+        # Push anything still buffered before the process exits
+        self.db.flush_write_behind()
+        self.db.flush_rolling_stats()
+        try:
+            self.db.flush_local_store()
+        except Exception as e:
+            print(f"⚠️ Local store sync failed, rows stay queued for the next start: {e}")
+        print("👋 Collector stopped.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Collect current weather periodically and prefill history gaps nightly.")
+    parser.add_argument("--interval", type=float, default=COLLECT_INTERVAL, help="seconds between ingest passes")
+    parser.add_argument("--jitter", type=float, default=COLLECT_JITTER, help="random spread of each run, in seconds")
+    parser.add_argument("--backfill-hour", type=int, default=COLLECT_BACKFILL_HOUR, help="local hour for the gap prefill")
+    parser.add_argument("--backfill-days", type=int, default=COLLECT_BACKFILL_DAYS)
+    parser.add_argument("--workers", type=int, default=COLLECT_WORKERS)
+    parser.add_argument("--rate", type=float, default=INGEST_RATE_LIMIT, help="max upstream calls per second")
+    parser.add_argument("--once", action="store_true", help="run one ingest pass and one gap prefill, then exit")
+    args = parser.parse_args()
+
+    collector = Collector(SupabaseDB(), interval=args.interval, jitter=args.jitter, backfill_hour=args.backfill_hour,
+                          backfill_days=args.backfill_days, workers=args.workers, rate_limit=args.rate)
+    signal.signal(signal.SIGINT, collector.stop)
+    signal.signal(signal.SIGTERM, collector.stop)
+    if args.once:
+        collector.collect_current()
+        collector.prefill_gaps()
+        collector.shutdown()
+    else:
+        collector.run()
@@ -1,6 +1,5 @@
 import os
 from dotenv import load_dotenv
-from supabase import create_client
 
 load_dotenv()
 
@@ -9,5 +8,78 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 WEATHER_API_KEY = os.getenv("WEATHER_API_KEY") 
 WEATHER_API_URL = os.getenv("WEATHER_API_URL") 
 
+# Max number of historical days fetched in parallel when backfilling a window
+BACKFILL_CONCURRENCY = int(os.getenv("BACKFILL_CONCURRENCY", "8"))
+
+# Bulk ingestion of current weather for many localities
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "8"))
+INGEST_RATE_LIMIT = float(os.getenv("INGEST_RATE_LIMIT", "10"))  # upstream calls per second
+INSERT_CHUNK_SIZE = int(os.getenv("INSERT_CHUNK_SIZE", "500"))  # rows per multi-row insert
+
+# History backfill: consecutive missing days are fetched as dt..end_dt ranges of up to this many days.
+# WeatherAPI allows 30; days a range call leaves out are fetched one by one, and 1 skips range calls entirely
+HISTORY_MAX_RANGE_DAYS = int(os.getenv("HISTORY_MAX_RANGE_DAYS", "30"))
+HISTORY_UNAVAILABLE_TTL = float(os.getenv("HISTORY_UNAVAILABLE_TTL", "86400"))  # seconds before retrying days with no data
+
+# A new locality within this many km of an existing one reuses it instead of adding a duplicate (0 disables)
+LOCALITY_SNAP_KM = float(os.getenv("LOCALITY_SNAP_KM", "2"))
+
+# Background collector (collector.py)
+COLLECT_INTERVAL = float(os.getenv("COLLECT_INTERVAL", "3600"))  # seconds between current-weather passes
+COLLECT_JITTER = float(os.getenv("COLLECT_JITTER", "300"))  # random spread of each run, seconds
+COLLECT_BACKFILL_HOUR = int(os.getenv("COLLECT_BACKFILL_HOUR", "2"))  # local hour of the nightly gap prefill
+COLLECT_BACKFILL_DAYS = int(os.getenv("COLLECT_BACKFILL_DAYS", "30"))
+COLLECT_WORKERS = int(os.getenv("COLLECT_WORKERS", str(INGEST_CONCURRENCY)))
+
+# Local SQLite tier for finished days; set LOCAL_STORE_PATH to an empty string to disable
+LOCAL_STORE_PATH = os.getenv("LOCAL_STORE_PATH", os.path.join(os.path.expanduser("~"), ".weather_insight", "store.sqlite3"))
+
+# Keep the 24 hourly observations from each history response (needs sql/weather_hourly.sql)
+HOURLY_INGESTION = os.getenv("HOURLY_INGESTION", "0").lower() in ("1", "true", "yes")
+
+# Rolling statistics updated on every insert (needs sql/weather_rolling_stats.sql)
+ROLLING_STATS = os.getenv("ROLLING_STATS", "0").lower() in ("1", "true", "yes")
+ROLLING_WINDOWS = tuple(int(d) for d in os.getenv("ROLLING_WINDOWS", "7,30,365").split(","))
+ROLLING_FLUSH_INTERVAL = float(os.getenv("ROLLING_FLUSH_INTERVAL", "60"))  # seconds between rolling stats writes
+
+# Upsert weather rows on (locality_id, measurement_date) instead of inserting them, so re-fetched
+# days replace the stored row (needs sql/weather_data_unique.sql; without it Postgres rejects the upsert)
+WEATHER_UPSERT = os.getenv("WEATHER_UPSERT", "0").lower() in ("1", "true", "yes")
+
+# Buffer insert_weather() rows and write them in batches (needs WEATHER_UPSERT, so replayed rows aren't duplicated)
+WRITE_BEHIND = os.getenv("WRITE_BEHIND", "0").lower() in ("1", "true", "yes")
+WRITE_BEHIND_BATCH = int(os.getenv("WRITE_BEHIND_BATCH", "500"))  # flush once this many rows are queued
+WRITE_BEHIND_INTERVAL = float(os.getenv("WRITE_BEHIND_INTERVAL", "2"))  # seconds a row may wait
+WRITE_BEHIND_SPILL = os.getenv("WRITE_BEHIND_SPILL", os.path.join(os.path.expanduser("~"), ".weather_insight", "write_behind.jsonl"))
+
+# Rows fetched per page when streaming exports
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "1000"))
+# st.download_button holds the whole file in memory, so the Streamlit export is capped; the CLI streams to disk
+STREAMLIT_EXPORT_MAX_DAYS = int(os.getenv("STREAMLIT_EXPORT_MAX_DAYS", "365"))
+
+# Serve history requests through the asyncio client layer (async_client.py)
+ASYNC_IO = os.getenv("ASYNC_IO", "0").lower() in ("1", "true", "yes")
+
+# Shared HTTP transport used for all WeatherAPI calls
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "5"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "16"))  # connections kept alive per host
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+HTTP_BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.3"))
+
+# Upstream protection for WeatherAPI: token bucket that halves on 429, and a circuit breaker
+API_RATE_LIMIT = float(os.getenv("API_RATE_LIMIT", "50"))  # calls per second
+API_MAX_RETRY_AFTER = float(os.getenv("API_MAX_RETRY_AFTER", "10"))  # longer Retry-After opens the circuit instead of waiting
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))  # consecutive failures before failing fast
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))  # seconds before a half-open probe
+
+# In-process cache in front of WeatherAPI
+CACHE_MAXSIZE = int(os.getenv("CACHE_MAXSIZE", "2048"))
+CURRENT_WEATHER_TTL = float(os.getenv("CURRENT_WEATHER_TTL", "600"))  # seconds
+CACHE_COORD_PRECISION = int(os.getenv("CACHE_COORD_PRECISION", "2"))  # decimal places, ~1 km at 2
+
+# Per-operation latency/bytes tracing (see metrics.py)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0").lower() in ("1", "true", "yes")
+
 def get_supabase_client():
+    from supabase import create_client  # the SDK is slow to import; only load it when connecting
     return create_client(SUPABASE_URL, SUPABASE_KEY)
@@ -0,0 +1,112 @@
+"""Constant-memory history export to CSV or Parquet.
+
+Rows are pulled page by page from SupabaseDB.iter_weather_pages and written as
+they arrive. The Average/Minimum/Maximum summary rows are computed by the database
+(SupabaseDB.aggregate_weather) once the rows are written.
+"""
+import csv
+from datetime import datetime, timedelta
+
+EXPORT_COLUMNS = ["weather_id", "locality_id", "measurement_date", "temperature", "humidity", "description", "wind_speed"]
+SUMMARY_COLUMNS = {"temperature": "temp", "humidity": "hum", "wind_speed": "wind"}  # column -> aggregate prefix
+
+
+class AggregateSummary:
+    """Whole-window avg/min/max per numeric column, from one aggregate_weather(bucket="all") call per locality."""
+
+    def __init__(self, db, locality_ids, days):
+        self.db = db
+        self.locality_ids = locality_ids
+        self.days = days
+
+    def rows(self):
+        """Summary rows in the layout of the exported file; none if the aggregate functions aren't installed."""
+        try:
+            buckets = [b for lid in self.locality_ids for b in self.db.aggregate_weather(lid, self.days, bucket="all")]
+        except Exception as e:
+            print(f"⚠️ Summary rows skipped (apply sql/weather_aggregates.sql): {e}")
+            return []
+        avg, low, high = {}, {}, {}
+        for col, prefix in SUMMARY_COLUMNS.items():
+            # several localities: averages weighted by record count
+            weighted = [(b[f"{prefix}_avg"], b["records"]) for b in buckets if b[f"{prefix}_avg"] is not None]
+            total = sum(n for _, n in weighted)
+            avg[col] = round(sum(v * n for v, n in weighted) / total, 2) if total else None
+            low[col] = min((b[f"{prefix}_min"] for b in buckets if b[f"{prefix}_min"] is not None), default=None)
+            high[col] = max((b[f"{prefix}_max"] for b in buckets if b[f"{prefix}_max"] is not None), default=None)
+        return [
+            {"measurement_date": "Average", "description": "", **avg},
+            {"measurement_date": "Minimum", "description": "", **low},
+            {"measurement_date": "Maximum", "description": "", **high},
+        ]
+
+
+def _clean(row):
+    row = {col: row.get(col) for col in EXPORT_COLUMNS}
+    if row["measurement_date"]:
+        row["measurement_date"] = str(row["measurement_date"])[:10]
+    return row
+
+
+def iter_export_rows(db, locality_ids, days=7):
+    since = (datetime.now() - timedelta(days=days-1)).date()
+    for page in db.iter_weather_pages(locality_ids, since):
+        for row in page:
+            yield _clean(row)
+
+
+def write_csv(rows, summary, out):
+    count = 0
+    writer = csv.DictWriter(out, fieldnames=EXPORT_COLUMNS, restval="")
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    writer.writerows(summary.rows())
+    return count
+
+
+def write_parquet(rows, summary, out, batch_size=1000):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Parquet export needs pyarrow: pip install pyarrow") from e
+
+    schema = pa.schema([
+        ("weather_id", pa.int64()),
+        ("locality_id", pa.int64()),
+        ("measurement_date", pa.string()),
+        ("temperature", pa.float64()),
+        ("humidity", pa.float64()),
+        ("description", pa.string()),
+        ("wind_speed", pa.float64()),
+    ])
+    count = 0
+    with pq.ParquetWriter(out, schema) as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            count += 1
+            if len(batch) >= batch_size:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                batch = []
+        writer.write_table(pa.Table.from_pylist(batch + summary.rows(), schema=schema))
+    return count
+
+
+def export_history(db, locality_ids, days, out, fmt="csv"):
+    """Stream the last `days` days of the given localities to `out` (a path or binary/text file).
+
+    Returns the number of data rows written (summary rows excluded).
+    """
+    summary = AggregateSummary(db, locality_ids, days)
+    rows = iter_export_rows(db, locality_ids, days)
+    if fmt == "parquet":
+        return write_parquet(rows, summary, out)
+    if fmt != "csv":
+        raise ValueError(f"Unsupported export format: {fmt}")
+    if isinstance(out, str):
+        with open(out, "w", newline="", encoding="utf-8") as f:
+            return write_csv(rows, summary, f)
+    return write_csv(rows, summary, out)
@@ -0,0 +1,118 @@
+"""Fleet-wide analytics across many localities.
+
+All windows are read with one paginated `in_("locality_id", ...)` query and laid
+out as (localities x days) float arrays, so per-locality stats, rankings,
+anomalies against the fleet and correlations are vectorized 2-D operations.
+Only stored rows are used; gaps stay NaN instead of triggering per-locality backfills.
+"""
+import warnings
+from datetime import datetime, timedelta
+import numpy as np
+
+METRICS = ("temperature", "humidity", "wind_speed")
+
+
+def build_matrices(rows, locality_ids, window):
+    """Scatter rows into one (len(locality_ids) x len(window)) NaN-filled array per metric."""
+    row_of = {lid: i for i, lid in enumerate(locality_ids)}
+    col_of = {day: j for j, day in enumerate(window)}
+    matrices = {m: np.full((len(locality_ids), len(window)), np.nan) for m in METRICS}
+    for r in rows:
+        i = row_of.get(r["locality_id"])
+        j = col_of.get(str(r["measurement_date"])[:10])
+        if i is None or j is None:
+            continue
+        for m in METRICS:
+            value = r.get(m)
+            if value is not None:
+                matrices[m][i, j] = float(value)  # rows arrive in date order, so the latest reading of a day wins
+    return matrices
+
+
+def _nan_stats(matrix):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN rows/columns give NaN
+        return {
+            "avg": np.nanmean(matrix, axis=1),
+            "min": np.nanmin(matrix, axis=1),
+            "max": np.nanmax(matrix, axis=1),
+            "std": np.nanstd(matrix, axis=1, ddof=1),
+            "count": np.sum(~np.isnan(matrix), axis=1),
+        }
+
+
+def correlation_matrix(matrix):
+    """Pearson correlation between locality series; missing days are imputed with the locality's mean."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        row_mean = np.nanmean(matrix, axis=1, keepdims=True)
+        filled = np.where(np.isnan(matrix), row_mean, matrix)
+        centered = filled - filled.mean(axis=1, keepdims=True)
+        norms = np.sqrt((centered ** 2).sum(axis=1))
+        corr = (centered @ centered.T) / np.outer(norms, norms)
+    return np.clip(corr, -1.0, 1.0)
+
+
+def fleet_anomalies(matrix, z_threshold=2.0):
+    """(locality index, day index, value, z) where a value is z_threshold sigmas from that day's fleet mean."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        day_mean = np.nanmean(matrix, axis=0)
+        day_std = np.nanstd(matrix, axis=0)
+        z = (matrix - day_mean) / np.where(day_std > 0, day_std, np.nan)
+    hits = np.argwhere(np.abs(np.nan_to_num(z)) >= z_threshold)
+    return [(int(i), int(j), float(matrix[i, j]), float(z[i, j])) for i, j in hits], day_mean
+
+
+def _clean(value, digits=2):
+    return None if value is None or np.isnan(value) else round(float(value), digits)
+
+
+def analyze_fleet(db, locality_ids, days=7, metric="temperature", z_threshold=2.0):
+    """Per-locality stats, ranking, anomalies and correlations for `metric` over the last `days` days."""
+    if metric not in METRICS:
+        raise ValueError(f"metric must be one of {', '.join(METRICS)}")
+    locality_ids = list(dict.fromkeys(locality_ids))
+    if not locality_ids:
+        return None
+
+    window = [(datetime.now() - timedelta(days=days-1-i)).date().isoformat() for i in range(days)]
+    rows = [r for page in db.iter_weather_pages(locality_ids, window[0]) for r in page]
+    names = {lid: (db.get_locality_by_id(lid) or {}).get("locality_name", str(lid)) for lid in locality_ids}
+    matrices = build_matrices(rows, locality_ids, window)
+    matrix = matrices[metric]
+
+    stats = {m: _nan_stats(matrices[m]) for m in METRICS}
+    per_locality = []
+    for i, lid in enumerate(locality_ids):
+        entry = {"locality_id": lid, "locality_name": names[lid], "records": int(stats[metric]["count"][i])}
+        for m in METRICS:
+            for k in ("avg", "min", "max", "std"):
+                entry[f"{m}_{k}"] = _clean(stats[m][k][i])
+        per_locality.append(entry)
+
+    # Highest average first; localities with no data go last
+    averages = stats[metric]["avg"]
+    order = np.argsort(np.where(np.isnan(averages), -np.inf, averages))[::-1]
+    ranking = [
+        {"rank": rank + 1, "locality_id": locality_ids[i], "locality_name": names[locality_ids[i]], "avg": _clean(averages[i])}
+        for rank, i in enumerate(order)
+    ]
+
+    hits, day_mean = fleet_anomalies(matrix, z_threshold)
+    anomalies = [
+        {"locality_id": locality_ids[i], "locality_name": names[locality_ids[i]], "date": window[j],
+         "value": round(value, 2), "fleet_mean": _clean(day_mean[j]), "z": round(z, 2)}
+        for i, j, value, z in hits
+    ]
+
+    return {
+        "metric": metric,
+        "days": window,
+        "localities": [names[lid] for lid in locality_ids],
+        "per_locality": per_locality,
+        "ranking": ranking,
+        "fleet_mean": [_clean(v) for v in day_mean],
+        "anomalies": anomalies,
+        "correlation": [[_clean(v, 3) for v in row] for row in correlation_matrix(matrix)],
+    }
@@ -0,0 +1,83 @@
+"""Plan history backfills as date ranges instead of one API call per day.
+
+Missing days are merged into contiguous ranges, each fetched with a single
+history request (dt..end_dt), split only where a range would exceed the
+provider's per-request limit. Ranges the provider has no data for are
+remembered for a while so every view doesn't ask for them again.
+"""
+import time
+from datetime import date, timedelta
+
+
+def plan_ranges(days, max_span):
+    """Merge ISO dates into sorted (start, end) ranges of consecutive days, at most max_span days each."""
+    ranges = []
+    for day in sorted({date.fromisoformat(str(d)[:10]) for d in days}):
+        if ranges and (day - ranges[-1][1]).days == 1 and (day - ranges[-1][0]).days < max_span:
+            ranges[-1][1] = day
+        else:
+            ranges.append([day, day])
+    return [(start.isoformat(), end.isoformat()) for start, end in ranges]
+
+
+def expand_range(start, end):
+    """ISO dates from start to end inclusive."""
+    first, last = date.fromisoformat(start), date.fromisoformat(end)
+    return [(first + timedelta(days=i)).isoformat() for i in range((last - first).days + 1)]
+
+
+def is_unavailable(error):
+    """True if the provider answered but has no data for the request, as opposed to being down.
+
+    That is a 4xx other than 401/403 (bad key, exhausted quota) and 429 (rate limited).
+    """
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    return status is not None and 400 <= status < 500 and status not in (401, 403, 429)
+
+
+def short_days(outcomes):
+    """Days of multi-day ((start, end), results, error) outcomes the range call didn't return.
+
+    Plans without end_dt support answer a range with only its dt day, and some reject
+    end_dt outright, so these days are asked for again one by one before any of them
+    counts as unavailable. Days lost to an outage are not included.
+    """
+    days = []
+    for (start, end), results, error in outcomes:
+        if start != end and (error is None or is_unavailable(error)):
+            days.extend(day for day in expand_range(start, end) if day not in results)
+    return days
+
+
+class UnavailableRanges:
+    """Per-locality date ranges with no upstream history, kept in the local store when there is one.
+
+    Entries expire after `ttl` seconds, after which the days are asked for again.
+    """
+
+    def __init__(self, store=None, ttl=86400):
+        self.store = store
+        self.ttl = ttl
+        self._ranges = {}  # locality_id -> [(start, end, recorded_at)] when there is no store
+
+    def add(self, locality_id, start, end):
+        now = time.time()
+        if self.store:
+            self.store.mark_unavailable(locality_id, start, end, now)
+        else:
+            self._ranges.setdefault(locality_id, []).append((start, end, now))
+
+    def ranges(self, locality_id):
+        since = time.time() - self.ttl
+        if self.store:
+            return self.store.unavailable_ranges(locality_id, since)
+        live = [r for r in self._ranges.get(locality_id, []) if r[2] >= since]
+        self._ranges[locality_id] = live
+        return [(start, end) for start, end, _ in live]
+
+    def filter(self, locality_id, days):
+        """The days not covered by a recorded range."""
+        ranges = self.ranges(locality_id)
+        if not ranges:
+            return list(days)
+        return [d for d in days if not any(start <= str(d)[:10] <= end for start, end in ranges)]
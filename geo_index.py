@@ -0,0 +1,107 @@
+"""Grid index over locality coordinates for nearest and radius lookups.
+
+Points are bucketed into cells of `cell_deg` degrees (a fixed-precision
+geohash). A query only looks at the cells around the query point, widening
+ring by ring until no unvisited cell can hold anything closer.
+"""
+import math
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEG_LAT = math.pi * EARTH_RADIUS_KM / 180  # ~111.19
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class SpatialIndex:
+    def __init__(self, cell_deg=0.5):
+        self.cell_deg = cell_deg
+        self._lon_cells = int(round(360 / cell_deg))
+        self._max_ring = int(math.ceil(180 / cell_deg))
+        self._cells = {}   # (row, col) -> {id: (lat, lon)}
+        self._points = {}  # id -> (lat, lon, cell)
+
+    def __len__(self):
+        return len(self._points)
+
+    def _cell(self, lat, lon):
+        return int(math.floor((lat + 90) / self.cell_deg)), int(math.floor((lon + 180) / self.cell_deg)) % self._lon_cells
+
+    def add(self, key, latitude, longitude):
+        self.remove(key)
+        lat, lon = float(latitude), float(longitude)
+        cell = self._cell(lat, lon)
+        self._cells.setdefault(cell, {})[key] = (lat, lon)
+        self._points[key] = (lat, lon, cell)
+
+    def remove(self, key):
+        point = self._points.pop(key, None)
+        if point is not None:
+            bucket = self._cells[point[2]]
+            del bucket[key]
+            if not bucket:
+                del self._cells[point[2]]
+
+    def clear(self):
+        self._cells.clear()
+        self._points.clear()
+
+    def _ring(self, row, col, r):
+        """Cells at Chebyshev distance r from (row, col); columns wrap at the antimeridian."""
+        if r == 0:
+            yield row, col
+            return
+        for dr in range(-r, r + 1):
+            step = 1 if abs(dr) == r else 2 * r  # full top/bottom rows, only the two sides in between
+            for dc in range(-r, r + 1, step):
+                yield row + dr, (col + dc) % self._lon_cells
+
+    def _covered_km(self, lat, lon, row, col, r):
+        """Distance from the query point to the edge of the (2r+1)^2 cells searched so far (a lower bound)."""
+        south = (row - r) * self.cell_deg - 90
+        north = (row + r + 1) * self.cell_deg - 90
+        west = (col - r) * self.cell_deg - 180
+        east = (col + r + 1) * self.cell_deg - 180
+        lat_km = min(lat - south, north - lat) * KM_PER_DEG_LAT
+        # east-west degrees are shortest at the box's most poleward latitude
+        widest = min(90.0, max(abs(south), abs(north)))
+        lon_km = min(lon - west, east - lon) * KM_PER_DEG_LAT * math.cos(math.radians(widest))
+        return max(0.0, min(lat_km, lon_km))
+
+    def nearest(self, latitude, longitude, k=1, max_km=None):
+        """Up to k (distance_km, key) pairs, closest first, optionally within max_km."""
+        if not self._points:
+            return []
+        lat, lon = float(latitude), float(longitude)
+        row, col = self._cell(lat, lon)
+        found, seen = [], set()
+        for r in range(self._max_ring + 1):
+            for cell in self._ring(row, col, r):
+                if cell in seen:
+                    continue  # rings overlap once they wrap around the globe
+                seen.add(cell)
+                for key, (plat, plon) in self._cells.get(cell, {}).items():
+                    found.append((haversine_km(lat, lon, plat, plon), key))
+            found.sort()
+            if len(found) == len(self._points):
+                break
+            covered = self._covered_km(lat, lon, row, col, r)
+            if max_km is not None and covered >= max_km:
+                break
+            if len(found) >= k and found[k - 1][0] <= covered:
+                break
+            if len(seen) > len(self._points) + 64:
+                # sparse index or a query near a pole: scanning every point is cheaper than more rings
+                found = sorted((haversine_km(lat, lon, p[0], p[1]), key) for key, p in self._points.items())
+                break
+        if max_km is not None:
+            found = [f for f in found if f[0] <= max_km]
+        return found[:k]
+
+    def within(self, latitude, longitude, radius_km):
+        """All (distance_km, key) pairs within radius_km, closest first."""
+        return self.nearest(latitude, longitude, k=len(self._points), max_km=radius_km)
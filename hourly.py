@@ -0,0 +1,114 @@
+"""Compact storage of the hourly observations in WeatherAPI history responses.
+
+A day is held as parallel typed arrays (one slot per hour) instead of 24 dicts,
+and stored in Supabase as one weather_hourly row per (locality_id, day) with
+array columns (see sql/weather_hourly.sql).
+"""
+import math
+import sys
+import warnings
+from array import array
+from collections import Counter
+
+
+class HourlyDay:
+    __slots__ = ("measurement_date", "hours", "temperature", "humidity", "wind_speed", "description")
+
+    def __init__(self, measurement_date, hours, temperature, humidity, wind_speed, description):
+        self.measurement_date = measurement_date  # YYYY-MM-DD
+        self.hours = array("B", hours)            # hour of day, 0-23
+        self.temperature = array("f", temperature)
+        self.humidity = array("f", humidity)
+        self.wind_speed = array("f", wind_speed)
+        self.description = tuple(sys.intern(d or "") for d in description)
+
+    def __len__(self):
+        return len(self.hours)
+
+    @classmethod
+    def from_forecastday(cls, forecastday):
+        """Parse the `hour` list of a history.json forecastday entry."""
+        hours = forecastday.get("hour") or []
+        return cls(
+            forecastday["date"],
+            [int(h["time"][11:13]) for h in hours],  # "YYYY-MM-DD HH:MM"
+            [h["temp_c"] for h in hours],
+            [h["humidity"] for h in hours],
+            [h["wind_kph"] for h in hours],
+            [h["condition"]["text"] for h in hours],
+        )
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(
+            str(row["measurement_date"])[:10],
+            row["hours"],
+            [math.nan if v is None else v for v in row["temperature"]],
+            [math.nan if v is None else v for v in row["humidity"]],
+            [math.nan if v is None else v for v in row["wind_speed"]],
+            row["description"],
+        )
+
+    def to_row(self, locality_id):
+        return {
+            "locality_id": locality_id,
+            "measurement_date": self.measurement_date,
+            "hours": list(self.hours),
+            "temperature": [round(v, 2) for v in self.temperature],
+            "humidity": [round(v, 2) for v in self.humidity],
+            "wind_speed": [round(v, 2) for v in self.wind_speed],
+            "description": list(self.description),
+        }
+
+    def records(self):
+        """Expand to one weather dict per hour, shaped like weather_data rows."""
+        return [
+            {
+                "measurement_date": f"{self.measurement_date}T{h:02d}:00:00",
+                "temperature": round(t, 2),
+                "humidity": round(hu, 2),
+                "description": d,
+                "wind_speed": round(w, 2),
+            }
+            for h, t, hu, w, d in zip(self.hours, self.temperature, self.humidity, self.wind_speed, self.description)
+        ]
+
+
+def hourly_to_daily(days):
+    """Aggregate HourlyDay objects to daily records (mean temp/humidity, max wind, most frequent condition).
+
+    The arrays are stacked into a (days x 24) matrix, so each statistic is a single
+    vectorized reduction. Short days are padded with NaN.
+    """
+    import numpy as np  # deferred: HourlyDay is imported on every start, numpy only needed here
+
+    days = [d for d in days if len(d)]
+    if not days:
+        return []
+    width = max(len(d) for d in days)
+    temps = np.full((len(days), width), np.nan, dtype=np.float32)
+    hums = np.full_like(temps, np.nan)
+    winds = np.full_like(temps, np.nan)
+    for i, d in enumerate(days):
+        # array('f') shares its buffer with frombuffer, so no per-value conversion
+        temps[i, :len(d)] = np.frombuffer(d.temperature, dtype=np.float32)
+        hums[i, :len(d)] = np.frombuffer(d.humidity, dtype=np.float32)
+        winds[i, :len(d)] = np.frombuffer(d.wind_speed, dtype=np.float32)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN rows yield NaN
+        avg_temp = np.nanmean(temps, axis=1)
+        avg_hum = np.nanmean(hums, axis=1)
+        max_wind = np.nanmax(winds, axis=1)
+
+    daily = []
+    for i, d in enumerate(days):
+        descs = [x for x in d.description if x]
+        daily.append({
+            "measurement_date": d.measurement_date,
+            "temperature": None if np.isnan(avg_temp[i]) else round(float(avg_temp[i]), 1),
+            "humidity": None if np.isnan(avg_hum[i]) else round(float(avg_hum[i]), 1),
+            "description": Counter(descs).most_common(1)[0][0] if descs else None,
+            "wind_speed": None if np.isnan(max_wind[i]) else round(float(max_wind[i]), 1),
+        })
+    return daily
@@ -0,0 +1,56 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from metrics import metrics
+from config import HTTP_TIMEOUT, HTTP_POOL_MAXSIZE, HTTP_MAX_RETRIES, HTTP_BACKOFF_FACTOR
+
+
+class HTTPTransport:
+    """Pooled keep-alive HTTP session shared by every outbound API call."""
+
+    def __init__(self, timeout=HTTP_TIMEOUT, pool_maxsize=HTTP_POOL_MAXSIZE,
+                 max_retries=HTTP_MAX_RETRIES, backoff_factor=HTTP_BACKOFF_FACTOR, read_retries=0):
+        self.timeout = timeout
+        self.session = requests.Session()
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            # A read timeout is not retried: a hung upstream would cost (retries + 1) * timeout before
+            # WeatherAPI's circuit breaker saw a single failure
+            read=read_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset(["GET"]),
+            raise_on_status=False,
+            respect_retry_after_header=False,  # 429/Retry-After is handled by WeatherAPI's rate limiter and breaker
+        )
+        # pool_block caps open connections per host at pool_maxsize; extra callers wait for a free one
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize,
+                              max_retries=retry, pool_block=True)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get_json(self, url, params=None, timeout=None):
+        with metrics.span("http.get"):
+            response = self.session.get(url, params=params, timeout=timeout or self.timeout)
+            metrics.add_bytes(len(response.content))
+            response.raise_for_status()
+            return response.json()
+
+    def close(self):
+        self.session.close()
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    """Return the process-wide transport, creating it on first use."""
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = HTTPTransport()
+    return _transport
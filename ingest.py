@@ -0,0 +1,88 @@
+"""Batch ingestion of current weather for many localities.
+
+    python ingest.py                   # every locality
+    python ingest.py --filter bang     # localities whose name contains "bang"
+    python ingest.py --ids 1 2 3
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from supabase_client import SupabaseDB
+from weather_api import WeatherAPI, is_simulated
+from ratelimit import RateLimiter
+from config import INGEST_CONCURRENCY, INGEST_RATE_LIMIT, INSERT_CHUNK_SIZE
+
+
+def ingest_current_weather(db, name_filter=None, locality_ids=None, concurrency=INGEST_CONCURRENCY,
+                           rate_limit=INGEST_RATE_LIMIT, chunk_size=INSERT_CHUNK_SIZE):
+    """Fetch current weather for the selected localities and store it in chunked inserts.
+
+    Returns a report dict with counts, failures and throughput (localities/sec).
+    """
+    start = time.perf_counter()
+    localities = db.get_localities(name_filter=name_filter, locality_ids=locality_ids)
+    limiter = RateLimiter(rate_limit)
+    measured_at = datetime.now().isoformat()
+
+    def fetch(locality):
+        limiter.acquire()
+        try:
+            reading = WeatherAPI.get_weather(locality["latitude"], locality["longitude"])
+        except Exception as e:
+            return locality, None, str(e)
+        if is_simulated(reading):
+            return locality, None, "WeatherAPI unavailable"
+        temp, hum, desc, wind = reading
+        return locality, {
+            "locality_id": locality["locality_id"],
+            "temperature": temp,
+            "humidity": hum,
+            "description": desc,
+            "wind_speed": wind,
+            "measurement_date": measured_at
+        }, None
+
+    rows, failures = [], []
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        for locality, row, error in pool.map(fetch, localities):
+            if row is None:
+                failures.append({"locality_id": locality["locality_id"], "error": error})
+            else:
+                rows.append(row)
+
+    try:
+        db.insert_weather_bulk(rows, chunk_size=chunk_size)
+        stored = len(rows)
+    except Exception as e:
+        failures.append({"locality_id": None, "error": f"insert failed: {e}"})
+        stored = 0
+
+    elapsed = time.perf_counter() - start
+    return {
+        "localities": len(localities),
+        "stored": stored,
+        "failed": failures,
+        "elapsed_s": round(elapsed, 3),
+        "throughput": round(len(localities) / elapsed, 2) if elapsed > 0 else 0.0
+    }
+
+
+def print_report(report):
+    print(f"📥 Ingested {report['stored']}/{report['localities']} localities in {report['elapsed_s']}s "
+          f"({report['throughput']} localities/sec)")
+    for failure in report["failed"]:
+        print(f"⚠️ Locality {failure['locality_id']}: {failure['error']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch and store current weather for many localities.")
+    parser.add_argument("--filter", dest="name_filter", help="only localities whose name contains this text")
+    parser.add_argument("--ids", nargs="+", type=int, help="only these locality IDs")
+    parser.add_argument("--concurrency", type=int, default=INGEST_CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=INGEST_RATE_LIMIT, help="max upstream calls per second")
+    args = parser.parse_args()
+
+    report = ingest_current_weather(SupabaseDB(), name_filter=args.name_filter, locality_ids=args.ids,
+                                    concurrency=args.concurrency, rate_limit=args.rate)
+    print_report(report)
@@ -0,0 +1,117 @@
+"""Embedded SQLite tier under SupabaseDB for finished (immutable) days.
+
+Past days are served from here; only today and gaps go to Supabase. Rows
+backfilled from the history API are written here first, marked unsynced, and
+pushed to Supabase by flush(), so they survive a crash or restart before the
+remote insert succeeds.
+"""
+import os
+import sqlite3
+import threading
+
+_COLUMNS = ("locality_id", "measurement_date", "weather_id", "temperature", "humidity", "description", "wind_speed")
+
+
+class LocalStore:
+    def __init__(self, path):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self.conn.executescript("""
+                pragma journal_mode = wal;
+                pragma synchronous = normal;
+                create table if not exists weather_days (
+                    locality_id integer not null,
+                    measurement_date text not null,  -- YYYY-MM-DD
+                    weather_id integer,
+                    temperature real,
+                    humidity real,
+                    description text,
+                    wind_speed real,
+                    synced integer not null default 1,
+                    primary key (locality_id, measurement_date)
+                ) without rowid;
+                create index if not exists weather_days_pending on weather_days (synced) where synced = 0;
+                create table if not exists unavailable_ranges (
+                    locality_id integer not null,
+                    start_date text not null,
+                    end_date text not null,
+                    recorded_at real not null,  -- unix time
+                    primary key (locality_id, start_date, end_date)
+                ) without rowid;
+            """)
+
+    def get_range(self, locality_id, start, end):
+        """Stored rows for start..end inclusive, keyed by YYYY-MM-DD."""
+        with self._lock:
+            rows = self.conn.execute(
+                "select * from weather_days where locality_id = ? and measurement_date between ? and ?",
+                (locality_id, str(start), str(end))
+            ).fetchall()
+        return {r["measurement_date"]: {c: r[c] for c in _COLUMNS} for r in rows}
+
+    def put_many(self, rows, synced=True):
+        """Upsert day rows; later rows for the same day win, matching get_last_n_days."""
+        params = [
+            (r["locality_id"], str(r["measurement_date"])[:10], r.get("weather_id"), r.get("temperature"),
+             r.get("humidity"), r.get("description"), r.get("wind_speed"), int(synced))
+            for r in rows
+        ]
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "insert or replace into weather_days "
+                "(locality_id, measurement_date, weather_id, temperature, humidity, description, wind_speed, synced) "
+                "values (?, ?, ?, ?, ?, ?, ?, ?)",
+                params
+            )
+
+    def has_pending(self):
+        with self._lock:
+            return self.conn.execute("select 1 from weather_days where synced = 0 limit 1").fetchone() is not None
+
+    def pending(self, limit=1000):
+        with self._lock:
+            rows = self.conn.execute("select * from weather_days where synced = 0 limit ?", (limit,)).fetchall()
+        return [{c: r[c] for c in _COLUMNS} for r in rows]
+
+    def mark_synced(self, rows):
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "update weather_days set synced = 1 where locality_id = ? and measurement_date = ?",
+                [(r["locality_id"], str(r["measurement_date"])[:10]) for r in rows]
+            )
+
+    def flush(self, insert_rows, batch_size=1000):
+        """Push unsynced rows through insert_rows(rows). Returns the number of rows pushed."""
+        pushed = 0
+        while True:
+            rows = self.pending(batch_size)
+            if not rows:
+                return pushed
+            insert_rows(rows)
+            self.mark_synced(rows)
+            pushed += len(rows)
+
+    def mark_unavailable(self, locality_id, start, end, recorded_at):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "insert or replace into unavailable_ranges values (?, ?, ?, ?)",
+                (locality_id, str(start), str(end), recorded_at)
+            )
+
+    def unavailable_ranges(self, locality_id, since):
+        """(start, end) ranges recorded for the locality at or after unix time `since`; older ones are dropped."""
+        with self._lock, self.conn:
+            self.conn.execute("delete from unavailable_ranges where recorded_at < ?", (since,))
+            rows = self.conn.execute(
+                "select start_date, end_date from unavailable_ranges where locality_id = ?", (locality_id,)
+            ).fetchall()
+        return [(r["start_date"], r["end_date"]) for r in rows]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,130 @@
+import bisect
+import difflib
+import threading
+from metrics import execute
+from geo_index import SpatialIndex
+
+
+class LocalityIndex:
+    """In-memory copy of the localities table for name, ID and coordinate lookups without a round trip.
+
+    Loaded on first use, topped up incrementally with rows newer than the highest
+    known locality_id, and updated directly by SupabaseDB.insert_locality.
+    """
+
+    def __init__(self, client, fuzzy_cutoff=0.8):
+        self.client = client
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.by_id = {}
+        self._names = []  # sorted (lowercase name, locality_id) pairs
+        self.spatial = SpatialIndex()
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    def load(self):
+        rows = execute(self.client.table("localities").select("*")).data
+        with self._lock:
+            self.by_id = {}
+            self._names = []
+            self.spatial.clear()
+            self._add_rows(rows)
+            self._loaded = True
+
+    def refresh(self):
+        """Fetch only localities added since the last load. Returns the number of new rows."""
+        if not self._loaded:
+            self.load()
+            return len(self.by_id)
+        last_id = max(self.by_id, default=0)
+        rows = execute(self.client.table("localities").select("*").gt("locality_id", last_id)).data
+        with self._lock:
+            self._add_rows(rows)
+        return len(rows)
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded = False
+
+    def add(self, row):
+        with self._lock:
+            self._add_rows([row])
+
+    def _add_rows(self, rows):
+        for row in rows:
+            old = self.by_id.get(row["locality_id"])
+            if old is not None:
+                self._names.remove((old["locality_name"].lower(), old["locality_id"]))
+            self.by_id[row["locality_id"]] = row
+            bisect.insort(self._names, (row["locality_name"].lower(), row["locality_id"]))
+            if row.get("latitude") is not None and row.get("longitude") is not None:
+                self.spatial.add(row["locality_id"], row["latitude"], row["longitude"])
+            else:
+                self.spatial.remove(row["locality_id"])
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def get(self, locality_id):
+        self._ensure_loaded()
+        return self.by_id.get(locality_id)
+
+    def find_exact(self, name):
+        self._ensure_loaded()
+        key = name.strip().lower()
+        with self._lock:
+            i = bisect.bisect_left(self._names, (key,))
+            if i < len(self._names) and self._names[i][0] == key:
+                return self.by_id[self._names[i][1]]
+        return None
+
+    def find_prefix(self, prefix):
+        """All localities whose name starts with prefix, in name order."""
+        self._ensure_loaded()
+        key = prefix.strip().lower()
+        with self._lock:
+            i = bisect.bisect_left(self._names, (key,))
+            matches = []
+            while i < len(self._names) and self._names[i][0].startswith(key):
+                matches.append(self.by_id[self._names[i][1]])
+                i += 1
+        return matches
+
+    def find_fuzzy(self, name, limit=5):
+        """Closest names by similarity ratio, for "did you mean" hints on typos like 'Banglore'.
+
+        Never used to resolve a name: 'Bolton' is close enough to 'Boston' to match.
+        """
+        self._ensure_loaded()
+        with self._lock:
+            names = {n: loc_id for n, loc_id in self._names}
+        matches = difflib.get_close_matches(name.strip().lower(), names, n=limit, cutoff=self.fuzzy_cutoff)
+        return [self.by_id[names[m]] for m in matches]
+
+    def find(self, name):
+        """Best match for name: exact, then prefix, then substring. See find_fuzzy for suggestions."""
+        found = self.find_exact(name)
+        if found:
+            return found
+        prefixed = self.find_prefix(name)
+        if prefixed:
+            return prefixed[0]
+        key = name.strip().lower()
+        with self._lock:
+            for n, loc_id in self._names:
+                if key in n:
+                    return self.by_id[loc_id]
+        return None
+
+    def nearest(self, latitude, longitude, max_km=None):
+        """(locality, distance_km) closest to the coordinates, or None if nothing is within max_km."""
+        self._ensure_loaded()
+        with self._lock:
+            hits = self.spatial.nearest(latitude, longitude, k=1, max_km=max_km)
+            return (self.by_id[hits[0][1]], hits[0][0]) if hits else None
+
+    def within(self, latitude, longitude, radius_km):
+        """[(locality, distance_km)] within radius_km, closest first."""
+        self._ensure_loaded()
+        with self._lock:
+            return [(self.by_id[loc_id], dist) for dist, loc_id in self.spatial.within(latitude, longitude, radius_km)]
@@ -0,0 +1,207 @@
+"""Lightweight per-operation tracing: call counts, errors, bytes and latency percentiles.
+
+Disabled by default (METRICS_ENABLED=1 to turn on). When disabled, instrumented
+calls cost one attribute check.
+"""
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import deque
+from config import METRICS_ENABLED
+
+
+class _OpStats:
+    __slots__ = ("count", "errors", "bytes", "total", "samples")
+
+    def __init__(self, reservoir):
+        self.count = 0
+        self.errors = 0
+        self.bytes = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=reservoir)  # most recent durations, for percentiles
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+class _Span:
+    __slots__ = ("registry", "op", "start", "bytes")
+
+    def __init__(self, registry, op):
+        self.registry = registry
+        self.op = op
+        self.bytes = 0
+
+    def __enter__(self):
+        self.registry._stack().append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        stack = self.registry._stack()
+        stack.pop()
+        if stack:
+            stack[-1].bytes += self.bytes  # parent spans include their children's traffic
+        self.registry.record(self.op, elapsed, nbytes=self.bytes, error=exc_type is not None)
+        return False
+
+
+class _NullSpan:
+    bytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Metrics:
+    def __init__(self, enabled=False, reservoir=1024):
+        self.enabled = enabled
+        self.reservoir = reservoir
+        self._ops = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def span(self, op):
+        """Context manager timing a block of work as `op`."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, op)
+
+    def timed(self, op):
+        """Decorator recording every call of the function as `op`."""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with _Span(self, op):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def instrument(self, prefix):
+        """Class decorator timing every public method as `<prefix>.<method>`.
+
+        Generator methods are left alone: a span around them would close as soon as the
+        generator is created, so they time their own steps instead.
+        """
+        def decorator(cls):
+            for name, attr in list(vars(cls).items()):
+                if name.startswith("_"):
+                    continue
+                fn = attr.__func__ if isinstance(attr, staticmethod) else attr
+                if inspect.isgeneratorfunction(fn) or inspect.isasyncgenfunction(fn):
+                    continue
+                if isinstance(attr, staticmethod):
+                    setattr(cls, name, staticmethod(self.timed(f"{prefix}.{name}")(attr.__func__)))
+                elif callable(attr):
+                    setattr(cls, name, self.timed(f"{prefix}.{name}")(attr))
+            return cls
+        return decorator
+
+    def add_bytes(self, nbytes):
+        """Attribute transferred bytes to the innermost active span."""
+        if not self.enabled:
+            return
+        stack = self._stack()
+        if stack:
+            stack[-1].bytes += nbytes
+
+    def record(self, op, seconds, nbytes=0, error=False):
+        with self._lock:
+            stats = self._ops.get(op)
+            if stats is None:
+                stats = self._ops[op] = _OpStats(self.reservoir)
+            stats.count += 1
+            stats.errors += int(error)
+            stats.bytes += nbytes
+            stats.total += seconds
+            stats.samples.append(seconds)
+
+    def set_gauge(self, name, value):
+        """Current value of a level such as a queue depth (last write wins)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges[name] = value
+
+    def gauges(self):
+        with self._lock:
+            return dict(sorted(self._gauges.items()))
+
+    def reset(self):
+        with self._lock:
+            self._ops.clear()
+            self._gauges.clear()
+
+    def snapshot(self):
+        with self._lock:
+            ops = {op: (s.count, s.errors, s.bytes, s.total, sorted(s.samples)) for op, s in self._ops.items()}
+        return {
+            op: {
+                "count": count,
+                "errors": errors,
+                "bytes": nbytes,
+                "total_ms": round(total * 1000, 3),
+                "p50_ms": round(_percentile(samples, 0.50) * 1000, 3),
+                "p95_ms": round(_percentile(samples, 0.95) * 1000, 3),
+            }
+            for op, (count, errors, nbytes, total, samples) in sorted(ops.items())
+        }
+
+    def to_json(self, indent=2):
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self, namespace="weather"):
+        snap = self.snapshot()
+        lines = [
+            f"# TYPE {namespace}_op_calls_total counter",
+            *(f'{namespace}_op_calls_total{{op="{op}"}} {s["count"]}' for op, s in snap.items()),
+            f"# TYPE {namespace}_op_errors_total counter",
+            *(f'{namespace}_op_errors_total{{op="{op}"}} {s["errors"]}' for op, s in snap.items()),
+            f"# TYPE {namespace}_op_bytes_total counter",
+            *(f'{namespace}_op_bytes_total{{op="{op}"}} {s["bytes"]}' for op, s in snap.items()),
+            f"# TYPE {namespace}_op_latency_seconds summary",
+        ]
+        for op, s in snap.items():
+            lines.append(f'{namespace}_op_latency_seconds{{op="{op}",quantile="0.5"}} {s["p50_ms"] / 1000}')
+            lines.append(f'{namespace}_op_latency_seconds{{op="{op}",quantile="0.95"}} {s["p95_ms"] / 1000}')
+            lines.append(f'{namespace}_op_latency_seconds_sum{{op="{op}"}} {s["total_ms"] / 1000}')
+            lines.append(f'{namespace}_op_latency_seconds_count{{op="{op}"}} {s["count"]}')
+        for name, value in self.gauges().items():
+            lines.append(f"# TYPE {namespace}_{name} gauge")
+            lines.append(f"{namespace}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics(enabled=METRICS_ENABLED)
+
+
+def execute(query):
+    """Run a supabase query builder, attributing the approximate payload size to the active span."""
+    result = query.execute()
+    if metrics.enabled:
+        metrics.add_bytes(len(json.dumps(result.data, default=str)))
+    return result
@@ -0,0 +1,59 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """Token bucket: allows `rate` calls per second with bursts up to `burst`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        """Take a token now and return how many seconds the caller must wait before using it."""
+        with self._lock:
+            self._refill()
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+
+class AdaptiveRateLimiter(RateLimiter):
+    """Token bucket that backs off when the upstream throttles us.
+
+    throttle() halves the rate and drains the bucket so nothing is sent before
+    Retry-After has passed; each success afterwards wins back `recovery` of the
+    configured rate (additive increase, multiplicative decrease).
+    """
+
+    def __init__(self, rate, burst=None, min_rate=0.5, recovery=0.05):
+        super().__init__(rate, burst)
+        self.max_rate = self.rate
+        self.min_rate = min(min_rate, self.rate)
+        self.recovery = recovery
+
+    def throttle(self, retry_after=0.0):
+        with self._lock:
+            self._refill()
+            self.rate = max(self.min_rate, self.rate / 2)
+            # a deficit of rate * retry_after tokens keeps every caller waiting at least retry_after
+            self.tokens = min(self.tokens, 0.0) - retry_after * self.rate
+
+    def on_success(self):
+        if self.rate >= self.max_rate:
+            return
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * self.recovery)
@@ -0,0 +1,222 @@
+"""Typed weather rows, parsed once where they leave the database.
+
+WeatherRecord is a single weather_data row with __slots__: the date is a
+datetime.date (a datetime.datetime when the row carries a time of day) and the
+numeric fields are floats or None. WeatherBatch holds a window of rows as
+parallel numpy arrays (datetime64 dates, float32 measurements, NaN for missing)
+and hands them to pandas without copying. Its `simulated` mask marks fallback
+values made up during a WeatherAPI outage, which must not be cached as history.
+Iterating a batch yields records, and records still answer row["column"], so
+code written against the PostgREST dicts keeps working.
+"""
+import sys
+from datetime import date, datetime
+import numpy as np
+
+COLUMNS = ("weather_id", "locality_id", "measurement_date", "temperature", "humidity", "description", "wind_speed")
+MEASURES = ("temperature", "humidity", "wind_speed")
+DATE_DTYPE = "datetime64[s]"  # a resolution pandas keeps as-is
+DECIMALS = 2  # float32 keeps about 7 significant digits; readings are stored with at most 2 decimals
+
+
+def parse_date(value):
+    """A date for day values (midnight included), a naive datetime when there is a time of day."""
+    if value is None or isinstance(value, date) and not isinstance(value, datetime):
+        return value
+    if isinstance(value, np.datetime64):
+        value = value.astype("datetime64[s]").astype(object)
+    elif isinstance(value, str):
+        value = datetime.fromisoformat(value) if len(value) > 10 else date.fromisoformat(value)
+        if not isinstance(value, datetime):
+            return value
+    if value.tzinfo is not None:
+        value = value.replace(tzinfo=None)
+    return value.date() if value.time() == datetime.min.time() else value
+
+
+def _float(value):
+    try:
+        return float(value) if value is not None else None
+    except (ValueError, TypeError):
+        return None
+
+
+def _number(value):
+    # ints stay ints, so a humidity of 59 prints and exports as 59
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else _float(value)
+
+
+def _id(value):
+    return int(value) if value is not None else None
+
+
+class WeatherRecord:
+    __slots__ = COLUMNS
+
+    def __init__(self, measurement_date, temperature=None, humidity=None, description=None, wind_speed=None,
+                 locality_id=None, weather_id=None):
+        self.measurement_date = parse_date(measurement_date)
+        self.temperature = _number(temperature)
+        self.humidity = _number(humidity)
+        self.description = sys.intern(description) if description else description
+        self.wind_speed = _float(wind_speed)
+        self.locality_id = _id(locality_id)
+        self.weather_id = _id(weather_id)
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(row.get("measurement_date"), row.get("temperature"), row.get("humidity"), row.get("description"),
+                   row.get("wind_speed"), row.get("locality_id"), row.get("weather_id"))
+
+    # dict-style access, so callers written against PostgREST rows keep working
+    def __getitem__(self, key):
+        if key not in COLUMNS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in COLUMNS else default
+
+    def __contains__(self, key):
+        return key in COLUMNS
+
+    def keys(self):
+        return COLUMNS
+
+    def to_dict(self):
+        return {c: getattr(self, c) for c in COLUMNS}
+
+    def __eq__(self, other):
+        return isinstance(other, WeatherRecord) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"WeatherRecord({self.to_dict()!r})"
+
+
+def _has_offset(value):
+    return isinstance(value, str) and len(value) > 19 and (value[-1] == "Z" or value[-6] in "+-")
+
+
+def _dates(values):
+    # numpy parses ISO strings and date objects in one call; it would shift UTC offsets rather than drop them
+    if not any(_has_offset(v) for v in values):
+        try:
+            return np.array(values, dtype=DATE_DTYPE)
+        except ValueError:
+            pass
+    return np.array([parse_date(v) for v in values], dtype=DATE_DTYPE)
+
+
+def _measures(values):
+    try:
+        return np.array(values, dtype=np.float32)  # None becomes NaN
+    except (ValueError, TypeError):
+        return np.array([_float(v) for v in values], dtype=np.float64).astype(np.float32)
+
+
+def _reading(value):
+    value = round(float(value), DECIMALS)
+    return None if np.isnan(value) else int(value) if value.is_integer() else value
+
+
+class WeatherBatch:
+    __slots__ = COLUMNS + ("simulated",)
+
+    def __init__(self, measurement_date, temperature, humidity, wind_speed, description, locality_id, weather_id,
+                 simulated=None):
+        self.measurement_date = np.asarray(measurement_date, dtype=DATE_DTYPE)
+        self.temperature = np.asarray(temperature, dtype=np.float32)
+        self.humidity = np.asarray(humidity, dtype=np.float32)
+        self.wind_speed = np.asarray(wind_speed, dtype=np.float32)
+        self.description = np.asarray(description, dtype=object)
+        self.locality_id = np.asarray(locality_id, dtype=np.int64)  # -1 where unknown
+        self.weather_id = np.asarray(weather_id, dtype=np.int64)    # -1 for rows not read back from Supabase
+        # True for outage fallbacks (see SupabaseDB.store_backfill)
+        self.simulated = np.asarray([False] * len(self) if simulated is None else simulated, dtype=bool)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build a batch from weather_data dicts or WeatherRecords, in their order, one column at a time."""
+        def column(name):
+            return [r.get(name) for r in rows]
+
+        return cls(
+            _dates(column("measurement_date")),
+            _measures(column("temperature")),
+            _measures(column("humidity")),
+            _measures(column("wind_speed")),
+            [sys.intern(d) if d else "" for d in column("description")],
+            [-1 if v is None else int(v) for v in column("locality_id")],
+            [-1 if v is None else int(v) for v in column("weather_id")],
+            [bool(v) for v in column("simulated")],
+        )
+
+    @classmethod
+    def from_dataframe(cls, df):
+        def ids(col):
+            if col not in df.columns:
+                return np.full(len(df), -1, dtype=np.int64)
+            values = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+            return np.where(np.isnan(values), -1, values).astype(np.int64)
+
+        return cls(
+            df["measurement_date"].to_numpy(dtype=DATE_DTYPE),
+            df["temperature"].to_numpy(dtype=np.float32, na_value=np.nan),
+            df["humidity"].to_numpy(dtype=np.float32, na_value=np.nan),
+            df["wind_speed"].to_numpy(dtype=np.float32, na_value=np.nan),
+            df["description"].fillna("").to_numpy(dtype=object),
+            ids("locality_id"),
+            ids("weather_id"),
+        )
+
+    def __len__(self):
+        return len(self.measurement_date)
+
+    def __getitem__(self, i):
+        if isinstance(i, str):
+            if i not in COLUMNS:
+                raise KeyError(i)
+            return getattr(self, i)
+        return WeatherRecord(
+            self.measurement_date[i],
+            _reading(self.temperature[i]),
+            _reading(self.humidity[i]),
+            self.description[i] or None,
+            _reading(self.wind_speed[i]),
+            None if self.locality_id[i] < 0 else int(self.locality_id[i]),
+            None if self.weather_id[i] < 0 else int(self.weather_id[i]),
+        )
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def values(self, column):
+        """A measurement column as float64, rounded back to the stored precision."""
+        return np.round(getattr(self, column).astype(np.float64), DECIMALS)
+
+    def date_strings(self, index=None):
+        """ISO dates (of the rows at `index`, if given), or ISO timestamps when any row carries a time of day."""
+        dates = self.measurement_date if index is None else self.measurement_date[index]
+        unit = "s" if (dates != dates.astype("datetime64[D]")).any() else "D"
+        return np.datetime_as_string(dates, unit=unit)
+
+    def to_records(self):
+        return list(self)
+
+    def to_dataframe(self):
+        """A DataFrame over the batch's arrays; the date and measurement columns are not copied."""
+        import pandas as pd
+
+        return pd.DataFrame({
+            "weather_id": pd.arrays.IntegerArray(self.weather_id, self.weather_id < 0),
+            "locality_id": pd.arrays.IntegerArray(self.locality_id, self.locality_id < 0),
+            "measurement_date": self.measurement_date,
+            "temperature": self.temperature,
+            "humidity": self.humidity,
+            "description": self.description,
+            "wind_speed": self.wind_speed,
+        }, copy=False)
+
+
+def as_batch(rows):
+    return rows if isinstance(rows, WeatherBatch) else WeatherBatch.from_rows(rows)
@@ -0,0 +1,360 @@
+"""Incrementally maintained per-locality statistics over rolling day windows.
+
+A window holds one reading per day, matching weather_data's upsert key: a later
+reading for a day replaces the earlier one. Each insert updates every window in
+O(1) amortized: Welford mean/variance, monotonic deques for sliding min/max,
+running least-squares sums for the trend slope, and condition counters. The
+newest day is kept out of those structures until a later day arrives, so
+repeated readings for it (the collector's hourly passes) replace it in O(1).
+Readings for an older day still inside the window trigger a rebuild of that
+window only (O(window)). Summaries are of the window ending today, so days that
+have aged out are dropped even when no newer reading has arrived.
+
+RollingStatsStore seeds a locality without stored state from its weather_data
+history and persists the state at most every `flush_interval` seconds.
+A flush re-reads the stored state and applies this process's changed days on
+top, so processes sharing a locality don't overwrite each other's days.
+"""
+import json
+import math
+import threading
+import time
+from collections import Counter, deque
+from datetime import date
+from metrics import execute
+
+SERIES = ("temperature", "humidity", "wind_speed")
+PREFIX = {"temperature": "temp", "humidity": "hum", "wind_speed": "wind"}
+
+
+def _day_number(measurement_date):
+    return date.fromisoformat(str(measurement_date)[:10]).toordinal()
+
+
+def _to_float(value):
+    try:
+        return float(value) if value is not None else None
+    except (ValueError, TypeError):
+        return None
+
+
+class _SeriesStats:
+    __slots__ = ("n", "mean", "m2", "sx", "sy", "sxy", "sxx", "mins", "maxs")
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.sx = self.sy = self.sxy = self.sxx = 0.0
+        self.mins = deque()  # (seq, value), values increasing
+        self.maxs = deque()  # (seq, value), values decreasing
+
+    def add(self, seq, x, y):
+        self.n += 1
+        delta = y - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (y - self.mean)
+        self.sx += x
+        self.sy += y
+        self.sxy += x * y
+        self.sxx += x * x
+        while self.mins and self.mins[-1][1] >= y:
+            self.mins.pop()
+        self.mins.append((seq, y))
+        while self.maxs and self.maxs[-1][1] <= y:
+            self.maxs.pop()
+        self.maxs.append((seq, y))
+
+    def remove(self, seq, x, y):
+        self.n -= 1
+        if self.n == 0:
+            self.mean = self.m2 = 0.0
+            self.sx = self.sy = self.sxy = self.sxx = 0.0
+        else:
+            delta = y - self.mean
+            self.mean -= delta / self.n
+            self.m2 = max(0.0, self.m2 - delta * (y - self.mean))
+            self.sx -= x
+            self.sy -= y
+            self.sxy -= x * y
+            self.sxx -= x * x
+        if self.mins and self.mins[0][0] == seq:
+            self.mins.popleft()
+        if self.maxs and self.maxs[0][0] == seq:
+            self.maxs.popleft()
+
+    def summary(self, extra=None):
+        """Summary of the series, plus an (x, y) point that isn't added to it if given."""
+        n, mean, m2 = self.n, self.mean, self.m2
+        sx, sy, sxy, sxx = self.sx, self.sy, self.sxy, self.sxx
+        lo = self.mins[0][1] if self.mins else None
+        hi = self.maxs[0][1] if self.maxs else None
+        if extra is not None:
+            x, y = extra
+            n += 1
+            delta = y - mean
+            mean += delta / n
+            m2 += delta * (y - mean)
+            sx, sy, sxy, sxx = sx + x, sy + y, sxy + x * y, sxx + x * x
+            lo = y if lo is None else min(lo, y)
+            hi = y if hi is None else max(hi, y)
+        if not n:
+            return {"avg": None, "min": None, "max": None, "std": 0, "slope": None}
+        denom = n * sxx - sx * sx
+        slope = (n * sxy - sx * sy) / denom if denom else 0.0
+        return {
+            "avg": round(mean, 2),
+            "min": lo,
+            "max": hi,
+            "std": round(math.sqrt(m2 / (n - 1)), 2) if n > 1 else 0,
+            "slope": round(slope, 4),  # units per day
+        }
+
+
+class RollingWindow:
+    """Statistics over the last `size` days, one reading per day."""
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = deque()  # (seq, day, values tuple, description) for the days before `latest`
+        self.latest = None      # (day, values, description) of the newest day, outside the running stats
+        self.series = {name: _SeriesStats() for name in SERIES}
+        self.conditions = Counter()
+        self._seq = 0
+        self._anchor = None  # x values are day numbers relative to this, keeping regression sums small
+
+    @property
+    def newest(self):
+        return self.latest[0] if self.latest else None
+
+    def add(self, day, values, description):
+        if self.latest is None:
+            self.latest = (day, values, description)
+            return
+        newest = self.latest[0]
+        if day <= newest - self.size:
+            return  # already outside the window
+        if day == newest:
+            self.latest = (day, values, description)  # a later reading for the same day replaces it
+        elif day > newest:
+            self._append(*self.latest)
+            self.latest = (day, values, description)
+            self._evict(day - self.size)
+        else:
+            self._rebuild_with(day, values, description)
+
+    def _append(self, day, values, description):
+        if self._anchor is None:
+            self._anchor = day
+        self._seq += 1
+        self.entries.append((self._seq, day, values, description))
+        for name, value in zip(SERIES, values):
+            if value is not None:
+                self.series[name].add(self._seq, day - self._anchor, value)
+        if description:
+            self.conditions[description] += 1
+
+    def advance(self, today):
+        """Drop the days that are outside the window ending at `today` (a day number)."""
+        if self.latest and self.latest[0] <= today - self.size:
+            self._rebuild_with()  # every stored day has aged out
+        else:
+            self._evict(today - self.size)
+
+    def _evict(self, cutoff):
+        while self.entries and self.entries[0][1] <= cutoff:
+            seq, day, values, description = self.entries.popleft()
+            for name, value in zip(SERIES, values):
+                if value is not None:
+                    self.series[name].remove(seq, day - self._anchor, value)
+            if description:
+                self.conditions[description] -= 1
+                if not self.conditions[description]:
+                    del self.conditions[description]
+
+    def days(self):
+        """(day, values, description) for every day in the window, oldest first."""
+        out = [(d, v, desc) for _, d, v, desc in self.entries]
+        if self.latest:
+            out.append(self.latest)
+        return out
+
+    def _rebuild_with(self, day=None, values=None, description=None):
+        by_day = {d: (d, v, desc) for d, v, desc in self.days()} if day is not None else {}
+        if day is not None:
+            by_day[day] = (day, values, description)
+        self.entries.clear()
+        self.latest = None
+        self.series = {name: _SeriesStats() for name in SERIES}
+        self.conditions = Counter()
+        self._anchor = None
+        for entry in sorted(by_day.values(), key=lambda e: e[0]):
+            self.add(*entry)
+
+    def summary(self):
+        out = {"window_days": self.size, "records": len(self.entries) + (self.latest is not None)}
+        conditions = Counter(self.conditions)
+        latest_values = (None,) * len(SERIES)
+        if self.latest:
+            day, latest_values, description = self.latest
+            if self._anchor is None:
+                self._anchor = day
+            if description:
+                conditions[description] += 1
+        for name, value in zip(SERIES, latest_values):
+            extra = (self.latest[0] - self._anchor, value) if value is not None else None
+            stats = self.series[name].summary(extra)
+            out.update({f"{PREFIX[name]}_{k}": v for k, v in stats.items()})
+        out["condition_counts"] = dict(conditions)
+        out["most_common_condition"] = conditions.most_common(1)[0][0] if conditions else None
+        return out
+
+
+class LocalityStats:
+    """Rolling windows of several sizes for one locality."""
+
+    def __init__(self, sizes=(7, 30, 365)):
+        self.windows = {size: RollingWindow(size) for size in sizes}
+
+    def add(self, row):
+        day = _day_number(row["measurement_date"])
+        values = tuple(_to_float(row.get(name)) for name in SERIES)
+        for window in self.windows.values():
+            window.add(day, values, row.get("description") or None)
+
+    def summary(self, size, today=None):
+        window = self.windows[size]
+        window.advance(today or date.today().toordinal())
+        return window.summary()
+
+    def to_state(self):
+        # the largest window holds every reading the smaller ones need
+        largest = self.windows[max(self.windows)]
+        return {
+            "sizes": sorted(self.windows),
+            "entries": [[date.fromordinal(day).isoformat(), *values, desc] for day, values, desc in largest.days()],
+            "summaries": {str(size): w.summary() for size, w in self.windows.items()},
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        stats = cls(sizes=tuple(state["sizes"]))
+        for day, t, h, w, desc in state["entries"]:
+            stats.add({"measurement_date": day, "temperature": t, "humidity": h, "wind_speed": w, "description": desc})
+        return stats
+
+
+class RollingStatsStore:
+    """Per-locality LocalityStats persisted to the weather_rolling_stats table."""
+
+    def __init__(self, client, sizes=(7, 30, 365), flush_interval=60.0, seed=None):
+        self.client = client
+        self.sizes = tuple(sizes)
+        self.flush_interval = flush_interval
+        self.seed = seed  # seed(locality_id, since) -> weather_data rows from `since` on
+        self._stats = {}
+        self._changed = {}     # locality_id -> {day number: row} not yet persisted
+        self._rebuilt = set()  # localities whose in-memory state replaces the stored one
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def _load(self, locality_id):
+        result = execute(self.client.table("weather_rolling_stats").select("state").eq("locality_id", locality_id))
+        if result.data:
+            state = result.data[0]["state"]
+            state = json.loads(state) if isinstance(state, str) else state
+            if tuple(state.get("sizes", ())) == self.sizes:
+                return LocalityStats.from_state(state)
+        return None
+
+    def _seeded(self, locality_id, rows=None):
+        if rows is None:
+            since = date.fromordinal(date.today().toordinal() - max(self.sizes) + 1)
+            rows = self.seed(locality_id, since) if self.seed else []
+        stats = LocalityStats(self.sizes)
+        for row in sorted(rows, key=lambda r: str(r["measurement_date"])):
+            stats.add(row)
+        return stats
+
+    def get(self, locality_id):
+        with self._lock:
+            stats = self._stats.get(locality_id)
+        if stats is None:
+            stats = self._load(locality_id)
+            seeded = stats is None  # nothing stored yet, or stored for other window sizes
+            if seeded:
+                stats = self._seeded(locality_id)
+            with self._lock:
+                if locality_id not in self._stats:
+                    self._stats[locality_id] = stats
+                    if seeded:
+                        self._rebuilt.add(locality_id)
+                stats = self._stats[locality_id]
+        return stats
+
+    def update(self, rows):
+        for row in rows:
+            stats = self.get(row["locality_id"])
+            with self._lock:
+                stats.add(row)
+                self._changed.setdefault(row["locality_id"], {})[_day_number(row["measurement_date"])] = row
+
+    def rebuild(self, locality_id, rows=None):
+        """Replace a locality's aggregates with ones built from `rows`, or from a fresh seed."""
+        stats = self._seeded(locality_id, rows)
+        with self._lock:
+            self._stats[locality_id] = stats
+            self._changed.pop(locality_id, None)
+            self._rebuilt.add(locality_id)
+
+    def summary(self, locality_id, window=7):
+        stats = self.get(locality_id)
+        with self._lock:
+            return stats.summary(window)
+
+    def maybe_flush(self):
+        """Flush if flush_interval seconds have passed since the last one; keeps per-insert cost O(1)."""
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            return self.flush()
+        return 0
+
+    def flush(self):
+        """Persist the localities changed since the last flush.
+
+        Each one's stored state is read back first and this process's changed days are
+        applied on top, so days written by other processes in the meantime are kept.
+        """
+        with self._flush_lock:
+            with self._lock:
+                changed, self._changed = self._changed, {}
+                rebuilt, self._rebuilt = self._rebuilt, set()
+                self._last_flush = time.monotonic()
+            payload = []
+            try:
+                for lid in rebuilt:
+                    with self._lock:
+                        payload.append({"locality_id": lid, "state": self._stats[lid].to_state()})
+                for lid, rows in changed.items():
+                    if lid in rebuilt:
+                        continue
+                    merged = self._load(lid) or self._seeded(lid)
+                    for day in sorted(rows):
+                        merged.add(rows[day])
+                    with self._lock:
+                        # rows that arrived during the merge are in the new _changed and go on top again
+                        for day in sorted(self._changed.get(lid, {})):
+                            merged.add(self._changed[lid][day])
+                        self._stats[lid] = merged
+                        payload.append({"locality_id": lid, "state": merged.to_state()})
+                if payload:
+                    execute(self.client.table("weather_rolling_stats").upsert(payload, on_conflict="locality_id"))
+            except Exception:
+                with self._lock:
+                    # keep the changes for the next flush; newer rows for a day win
+                    for lid, rows in changed.items():
+                        rows.update(self._changed.get(lid, {}))
+                        self._changed[lid] = rows
+                    self._rebuilt |= rebuilt
+                raise
+        return len(payload)
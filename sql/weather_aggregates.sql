@@ -0,0 +1,63 @@
+-- Server-side aggregation for weather_data, called through supabase-py `rpc()`.
+-- Apply once in the Supabase SQL editor (or psql) before using SupabaseDB.aggregate_weather.
+
+create index if not exists weather_data_locality_date_idx
+    on weather_data (locality_id, measurement_date);
+
+-- Per-bucket statistics. p_bucket is 'day', 'week', 'month' or 'all' (one row for the whole window).
+create or replace function weather_aggregate(p_locality_id bigint, p_since date, p_bucket text default 'day')
+returns table (
+    bucket date,
+    records bigint,
+    temp_avg double precision,
+    temp_min double precision,
+    temp_max double precision,
+    temp_std double precision,
+    hum_avg double precision,
+    hum_min double precision,
+    hum_max double precision,
+    hum_std double precision,
+    wind_avg double precision,
+    wind_min double precision,
+    wind_max double precision,
+    wind_std double precision
+)
+language sql stable
+as $$
+    select
+        case when p_bucket = 'all' then p_since
+             else date_trunc(p_bucket, measurement_date::timestamp)::date end as bucket,
+        count(*) as records,
+        round(avg(temperature)::numeric, 2)::double precision,
+        min(temperature)::double precision,
+        max(temperature)::double precision,
+        round(coalesce(stddev_samp(temperature), 0)::numeric, 2)::double precision,
+        round(avg(humidity)::numeric, 2)::double precision,
+        min(humidity)::double precision,
+        max(humidity)::double precision,
+        round(coalesce(stddev_samp(humidity), 0)::numeric, 2)::double precision,
+        round(avg(wind_speed)::numeric, 2)::double precision,
+        min(wind_speed)::double precision,
+        max(wind_speed)::double precision,
+        round(coalesce(stddev_samp(wind_speed), 0)::numeric, 2)::double precision
+    from weather_data
+    where locality_id = p_locality_id
+      and measurement_date >= p_since
+    group by 1
+    order by 1;
+$$;
+
+-- Number of records per condition text in the window.
+create or replace function weather_condition_histogram(p_locality_id bigint, p_since date)
+returns table (description text, records bigint)
+language sql stable
+as $$
+    select description, count(*) as records
+    from weather_data
+    where locality_id = p_locality_id
+      and measurement_date >= p_since
+      and description is not null
+      and description <> ''
+    group by description
+    order by records desc;
+$$;
@@ -0,0 +1,13 @@
+-- One weather_data row per (locality_id, measurement_date).
+-- With WEATHER_UPSERT=1, insert_weather / insert_weather_bulk upsert on this key, so repeated gap fills
+-- and write-behind retries replace a row instead of adding a duplicate.
+
+-- Keep the newest row of any existing duplicates
+delete from weather_data a
+using weather_data b
+where a.locality_id = b.locality_id
+  and a.measurement_date = b.measurement_date
+  and a.weather_id < b.weather_id;
+
+create unique index if not exists weather_data_locality_date_key
+    on weather_data (locality_id, measurement_date);
@@ -0,0 +1,13 @@
+-- Hourly observations kept from WeatherAPI history responses (HOURLY_INGESTION=1).
+-- One packed row per locality and day; array element i is the observation at hours[i].
+
+create table if not exists weather_hourly (
+    locality_id bigint not null references localities (locality_id),
+    measurement_date date not null,
+    hours smallint[] not null,
+    temperature real[] not null,
+    humidity real[] not null,
+    wind_speed real[] not null,
+    description text[] not null,
+    primary key (locality_id, measurement_date)
+);
@@ -0,0 +1,8 @@
+-- Incrementally maintained rolling statistics per locality (ROLLING_STATS=1), see rolling_stats.py.
+-- `state` holds the readings of the largest window plus the current per-window summaries.
+
+create table if not exists weather_rolling_stats (
+    locality_id bigint primary key references localities (locality_id),
+    state jsonb not null,
+    updated_at timestamptz not null default now()
+);
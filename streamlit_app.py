@@ -1,20 +1,127 @@
 import streamlit as st
 import pandas as pd
 from supabase_client import SupabaseDB
-from weather_api import WeatherAPI
+from weather_api import WeatherAPI, is_simulated
 from utils import analyze_and_plot_weather
-from datetime import datetime
+from metrics import metrics
+from export import export_history
+from async_client import load_history
+from records import WeatherBatch
+from fleet import analyze_fleet, METRICS as FLEET_METRICS
+from config import ROLLING_WINDOWS, STREAMLIT_EXPORT_MAX_DAYS
+from datetime import date
+import os
+import tempfile
 
-# --- Initialize DB ---
-db = SupabaseDB()
+# --- Initialize DB (one client per server process, shared across sessions and reruns) ---
+@st.cache_resource
+def get_db():
+    return SupabaseDB()
+
+db = get_db()
+
+# --- Cached queries: reruns that change nothing do no network I/O ---
+class NotCached(Exception):
+    """Raised inside a cached function to hand back a result st.cache_data must not keep."""
+
+    def __init__(self, value):
+        self.value = value
+
+def call_cached(cached_fn, *args):
+    try:
+        return cached_fn(*args)
+    except NotCached as e:
+        return e.value
+
+# Only hits are kept: a locality added by the CLI, collector or ingest is found on the next lookup
+@st.cache_data(ttl=3600, show_spinner=False)
+def cached_locality(name):
+    locality = db.get_locality_by_name(name)
+    if locality is None:
+        raise NotCached(None)
+    return locality
+
+def locality_not_found(name):
+    suggestions = db.suggest_localities(name)
+    st.error(f"Locality not found. Did you mean {', '.join(suggestions)}?" if suggestions else "Locality not found")
+
+# `day` keys the entry to the calendar date so the window rolls over at midnight.
+# Windows with simulated outage fallbacks are served once and not kept
+@st.cache_data(ttl=3600, show_spinner=False)
+def cached_history(locality_id, days, day):
+    records = load_history(db, locality_id, days=days)
+    if records and records.simulated.any():
+        raise NotCached(records)
+    return records
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def cached_analysis_records(locality_id, days, day):
+    records = call_cached(cached_history, locality_id, days, day)
+    if not records:
+        return []
+
+    # Dates arrive as datetime64 already, so no re-parsing here
+    df = records.to_dataframe()
+
+    # --- Keep only the latest record per date ---
+    df = df.sort_values("measurement_date").drop_duplicates(
+        subset="measurement_date", keep="last"
+    )
+
+    # --- Ensure continuous range ---
+    start_date = df["measurement_date"].min()
+    full_range = pd.date_range(start=start_date, periods=days, freq="D")
+
+    # Merge to fill missing dates
+    full_df = pd.DataFrame({"measurement_date": full_range})
+    df = full_df.merge(df, on="measurement_date", how="left")
+
+    # Forward/backward fill for missing data
+    for col in ["temperature", "humidity", "description", "wind_speed", "locality_id", "weather_id"]:
+        if col in df.columns:
+            df[col] = df[col].ffill().bfill()
+
+    if records.simulated.any():
+        raise NotCached(WeatherBatch.from_dataframe(df))
+    return WeatherBatch.from_dataframe(df)
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def cached_localities():
+    return db.get_localities()
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def cached_fleet(locality_ids, days, metric, day):
+    return analyze_fleet(db, list(locality_ids), days=days, metric=metric)
+
+def invalidate_weather_cache():
+    cached_history.clear()
+    cached_analysis_records.clear()
+    cached_fleet.clear()
 
 st.set_page_config(page_title="Weather Insight & Analysis", layout="wide")
 st.title("🌤 Weather Insight & Analysis System")
 
 # --- Sidebar Menu ---
-menu = ["Fetch & Store Today’s Weather", "View Last 7 Days History", "Analyze Weather Trends", "Export History to CSV"]
+menu = ["Fetch & Store Today’s Weather", "View Last 7 Days History", "Analyze Weather Trends", "Export History to CSV", "Compare Localities"]
 choice = st.sidebar.selectbox("Select Option", menu)
 
+# --- Debug panel (METRICS_ENABLED=1) ---
+if metrics.enabled:
+    with st.sidebar.expander("🛠 Debug: request metrics"):
+        snapshot = metrics.snapshot()
+        if snapshot:
+            st.dataframe(pd.DataFrame.from_dict(snapshot, orient="index"))
+        else:
+            st.caption("No calls recorded yet.")
+        st.json(WeatherAPI.cache_stats())
+        st.json(WeatherAPI.upstream_stats())
+        if db.write_behind:
+            st.json({"write_behind": db.write_behind.stats()})
+        st.download_button("Download JSON", metrics.to_json(), file_name="metrics.json", mime="application/json")
+        st.download_button("Download Prometheus", metrics.to_prometheus(), file_name="metrics.prom", mime="text/plain")
+        if st.button("Reset metrics"):
+            metrics.reset()
+
 # --- Fetch & Store ---
 if choice == menu[0]:
     st.subheader("Fetch & Store Today's Weather")
@@ -24,14 +131,21 @@ if choice == menu[0]:
         if not locality_name.strip():
             st.error("Please enter a locality name")
         else:
-            locality = db.get_locality_by_name(locality_name.strip())
+            locality = call_cached(cached_locality, locality_name.strip())
             
             if not locality:
                 coords = db.get_coordinates_from_api(locality_name.strip())
                 if coords:
-                    db.insert_locality(locality_name.strip(), coords["latitude"], coords["longitude"])
-                    locality = db.get_locality_by_name(locality_name.strip())
-                    st.success(f"Added new locality: {locality_name}")
+                    locality = db.insert_locality(locality_name.strip(), coords["latitude"], coords["longitude"])
+                    cached_locality.clear()
+                    cached_localities.clear()
+                    if not locality:
+                        st.error("Could not add locality. Aborting.")
+                        st.stop()
+                    if locality["locality_name"] != locality_name.strip():
+                        st.info(f"'{locality_name}' is at the same place as '{locality['locality_name']}'; using it.")
+                    else:
+                        st.success(f"Added new locality: {locality_name}")
                 else:
                     st.error("Could not fetch locality. Aborting.")
                     st.stop()
@@ -39,16 +153,20 @@ if choice == menu[0]:
             st.success(f"Found locality: {locality['locality_name']} (ID: {locality['locality_id']})")
             
             try:
-                temp, hum, desc, wind = WeatherAPI.get_weather(locality["latitude"], locality["longitude"])
+                reading = WeatherAPI.get_weather(locality["latitude"], locality["longitude"])
             except Exception as e:
-                st.warning(f"Error fetching weather: {e}")
-                temp, hum, desc, wind = None, None, None, None
-            
-            db.insert_weather(locality_id=locality["locality_id"], temperature=temp,
-                              humidity=hum, description=desc, wind_speed=wind)
-            
+                st.error(f"Error fetching weather: {e}")
+                st.stop()
+            temp, hum, desc, wind = reading
             st.write(f"🌡 Temperature: {temp}°C | 💧 Humidity: {hum}% | 💨 Wind: {wind} kph | Condition: {desc}")
-            st.success("Weather data stored successfully!")
+
+            if is_simulated(reading):
+                st.warning("WeatherAPI is unavailable, these are simulated values. Not storing them.")
+            else:
+                db.insert_weather(locality_id=locality["locality_id"], temperature=temp,
+                                  humidity=hum, description=desc, wind_speed=wind)
+                invalidate_weather_cache()
+                st.success("Weather data stored successfully!")
 
 # --- View History ---
 elif choice == menu[1]:
@@ -57,21 +175,18 @@ elif choice == menu[1]:
     days = st.number_input("Enter number of past days", min_value=1, max_value=30, value=7, step=1)
     
     if st.button("View History"):
-        locality = db.get_locality_by_name(locality_name.strip())
+        locality = call_cached(cached_locality, locality_name.strip())
         if not locality:
-            st.error("Locality not found")
+            locality_not_found(locality_name.strip())
         else:
-            records = db.get_last_n_days(locality["locality_id"], days=days)
+            records = call_cached(cached_history, locality["locality_id"], int(days), date.today().isoformat())
             if not records:
                 st.warning("No records found")
             else:
-                # Format dates
-                for r in records:
-                    if isinstance(r["measurement_date"], str):
-                        r["measurement_date"] = r["measurement_date"].split("T")[0]
-                
-                df = pd.DataFrame(records)
-                st.dataframe(df)
+                if records.simulated.any():
+                    st.warning(f"WeatherAPI is unavailable: {int(records.simulated.sum())} day(s) are simulated "
+                               "values, not stored.")
+                st.dataframe(records.to_dataframe())
 
 # --- Analyze Trends ---
 elif choice == menu[2]:
@@ -79,41 +194,22 @@ elif choice == menu[2]:
     locality_name = st.text_input("Enter locality name")
     
     if st.button("Analyze"):
-        locality = db.get_locality_by_name(locality_name.strip())
+        locality = call_cached(cached_locality, locality_name.strip())
         if not locality:
-            st.error("Locality not found")
+            locality_not_found(locality_name.strip())
         else:
-            records = db.get_last_n_days(locality["locality_id"], days=7)
+            records = call_cached(cached_analysis_records, locality["locality_id"], 7, date.today().isoformat())
             if not records:
                 st.warning("No records found")
             else:
-                import pandas as pd
-
-                df = pd.DataFrame(records)
-
-                # --- Fix measurement_date ---
-                df["measurement_date"] = pd.to_datetime(df["measurement_date"], errors="coerce")
-
-                # --- Keep only the latest record per date ---
-                df = df.sort_values("measurement_date").drop_duplicates(
-                    subset="measurement_date", keep="last"
-                )
-
-                # --- Ensure continuous 7-day range ---
-                start_date = df["measurement_date"].min()
-                full_range = pd.date_range(start=start_date, periods=7, freq="D")
-                
-                # Merge to fill missing dates
-                full_df = pd.DataFrame({"measurement_date": full_range})
-                df = full_df.merge(df, on="measurement_date", how="left")
-
-                # Forward/backward fill for missing data
-                for col in ["temperature", "humidity", "description", "wind_speed", "locality_id", "weather_id"]:
-                    if col in df.columns:
-                        df[col] = df[col].ffill().bfill()
-
                 # --- Call analysis & plotting function ---
-                analyze_and_plot_weather(df.to_dict(orient="records"), locality["locality_name"])
+                analyze_and_plot_weather(records, locality["locality_name"])
+
+                # --- Rolling windows, read from the incrementally maintained aggregates ---
+                if db.rolling:
+                    rolling = [db.rolling_stats(locality["locality_id"], w) for w in ROLLING_WINDOWS]
+                    st.subheader("Rolling Statistics")
+                    st.dataframe(pd.DataFrame(rolling).drop(columns=["condition_counts"]).set_index("window_days"))
 
                 st.success("Analysis complete! Check the plots above.")
 
@@ -122,50 +218,72 @@ elif choice == menu[2]:
 elif choice == menu[3]:
     st.subheader("Export History to CSV")
     locality_name = st.text_input("Enter locality name")
-    days = st.number_input("Number of past days to export", min_value=1, max_value=30, value=7, step=1)
+    days = st.number_input("Number of past days to export", min_value=1, max_value=STREAMLIT_EXPORT_MAX_DAYS,
+                           value=7, step=1)
+    st.caption(f"The download is held in memory, so it is limited to {STREAMLIT_EXPORT_MAX_DAYS} days. "
+               "For longer exports use `python app.py` → Export, which streams to a file.")
+    fmt = st.radio("Format", ["csv", "parquet"], horizontal=True)
+    fill_gaps = st.checkbox("Fill missing days from the history API", value=days <= 30)
     
     if st.button("Export CSV"):
-        locality = db.get_locality_by_name(locality_name.strip())
+        locality = call_cached(cached_locality, locality_name.strip())
         if not locality:
-            st.error("Locality not found")
+            locality_not_found(locality_name.strip())
         else:
-            records = db.get_last_n_days(locality["locality_id"], days=days)
-            if not records:
-                st.warning("No records found")
-            else:
-                df = pd.DataFrame(records)
-                df["measurement_date"] = pd.to_datetime(df["measurement_date"], errors="coerce")
-                df["measurement_date"] = df["measurement_date"].dt.strftime("%Y-%m-%d")
-
-                # Columns for summary (exclude IDs and description)
-                numeric_cols = ["temperature", "humidity", "wind_speed"]
+            if fill_gaps and db.fill_missing_days(locality["locality_id"], days=days):
+                invalidate_weather_cache()
 
-                avg_row = df[numeric_cols].mean()
-                avg_row["measurement_date"] = "Average"
+            # Stream rows to a temp file page by page instead of building a DataFrame. The download
+            # button still reads the file into memory, hence the STREAMLIT_EXPORT_MAX_DAYS cap
+            tmp = tempfile.NamedTemporaryFile(suffix=f".{fmt}", delete=False)
+            tmp.close()
+            try:
+                count = export_history(db, [locality["locality_id"]], days, tmp.name, fmt=fmt)
+                if not count:
+                    st.warning("No records found")
+                else:
+                    filename = f"{locality['locality_name']}_history.{fmt}"
+                    with open(tmp.name, "rb") as f:
+                        st.download_button(
+                            label=f"Download {fmt.upper()}",
+                            data=f,
+                            file_name=filename,
+                            mime="text/csv" if fmt == "csv" else "application/octet-stream"
+                        )
+                    st.success(f"✅ Exported {count} records + summary")
+            finally:
+                os.remove(tmp.name)  # also when the export fails, e.g. Parquet without pyarrow
 
-                min_row = df[numeric_cols].min()
-                min_row["measurement_date"] = "Minimum"
+# --- Compare Localities ---
+elif choice == menu[4]:
+    st.subheader("Compare Localities")
+    localities = cached_localities()
+    by_name = {loc["locality_name"]: loc["locality_id"] for loc in localities}
+    selected = st.multiselect("Localities", list(by_name), default=list(by_name)[:10])
+    days = st.number_input("Number of past days", min_value=1, max_value=365, value=7, step=1)
+    metric = st.selectbox("Metric", FLEET_METRICS)
 
-                max_row = df[numeric_cols].max()
-                max_row["measurement_date"] = "Maximum"
+    if st.button("Compare"):
+        if len(selected) < 2:
+            st.error("Select at least two localities")
+        else:
+            ids = tuple(by_name[name] for name in selected)
+            result = cached_fleet(ids, int(days), metric, date.today().isoformat())
 
-                # Add empty description + IDs for clarity
-                for row in [avg_row, min_row, max_row]:
-                    row["description"] = ""
-                    row["weather_id"] = ""
-                    row["locality_id"] = ""
+            st.markdown("**Ranking (highest average first)**")
+            st.dataframe(pd.DataFrame(result["ranking"]).set_index("rank"))
 
-                df = pd.concat([df, pd.DataFrame([avg_row, min_row, max_row])], ignore_index=True)
+            st.markdown("**Per-locality statistics**")
+            st.dataframe(pd.DataFrame(result["per_locality"]).set_index("locality_name"))
 
-                # Prepare for download
-                filename = f"{locality['locality_name']}_history.csv"
-                csv_data = df.to_csv(index=False).encode("utf-8")
+            st.markdown("**Daily fleet mean**")
+            st.line_chart(pd.DataFrame({"Fleet mean": result["fleet_mean"]}, index=result["days"]))
 
-                st.download_button(
-                    label="Download CSV",
-                    data=csv_data,
-                    file_name=filename,
-                    mime="text/csv"
-                )
-                st.success(f"✅ Exported {len(records)} records + summary")
+            st.markdown("**Anomalies against the fleet mean (|z| ≥ 2)**")
+            if result["anomalies"]:
+                st.dataframe(pd.DataFrame(result["anomalies"]))
+            else:
+                st.caption("No anomalies.")
 
+            st.markdown("**Correlation matrix**")
+            st.dataframe(pd.DataFrame(result["correlation"], index=result["localities"], columns=result["localities"]))
@@ -0,0 +1,329 @@
+"""Local stand-ins for the upstream services, used by benchmark.py."""
+import json
+import random
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+def _weather_payload(q):
+    lat, _, lon = q.partition(",")
+    rnd = random.Random(q)
+    return {
+        "location": {"name": q, "lat": float(lat) if lon else 12.97, "lon": float(lon) if lon else 77.59},
+        "current": {
+            "temp_c": round(rnd.uniform(15, 35), 1),
+            "humidity": rnd.randint(30, 90),
+            "wind_kph": round(rnd.uniform(0, 20), 1),
+            "condition": {"text": rnd.choice(["Sunny", "Partly cloudy", "Light rain"])},
+        },
+    }
+
+
+def _history_payload(q, dt, end_dt=None):
+    days = [dt]
+    if end_dt:
+        first, last = date.fromisoformat(dt), date.fromisoformat(end_dt)
+        days = [date.fromordinal(first.toordinal() + i).isoformat() for i in range((last - first).days + 1)]
+    return {
+        "location": {"name": q},
+        "forecast": {"forecastday": [_forecastday(q, day) for day in days]},
+    }
+
+
+def _forecastday(q, dt):
+    rnd = random.Random(f"{q}|{dt}")
+    hours = [
+        {
+            "time": f"{dt} {h:02d}:00",
+            "temp_c": round(rnd.uniform(15, 35), 1),
+            "humidity": rnd.randint(30, 90),
+            "wind_kph": round(rnd.uniform(0, 20), 1),
+            "condition": {"text": rnd.choice(["Sunny", "Partly cloudy", "Light rain"])},
+        }
+        for h in range(24)
+    ]
+    return {
+        "date": dt,
+        "day": {
+            "avgtemp_c": round(sum(h["temp_c"] for h in hours) / 24, 1),
+            "avghumidity": round(sum(h["humidity"] for h in hours) / 24),
+            "maxwind_kph": max(h["wind_kph"] for h in hours),
+            "condition": {"text": rnd.choice(["Sunny", "Partly cloudy", "Light rain"])},
+        },
+        "hour": hours,
+    }
+
+
+class WeatherAPIStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep connections open between requests
+    disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+    def setup(self):
+        super().setup()
+        # Charged once per TCP connection, standing in for the TLS handshake
+        if self.server.handshake_delay:
+            time.sleep(self.server.handshake_delay)
+
+    def _rpc(self, name, args):
+        from aggregates import SQLiteAggregator
+
+        if name not in ("weather_aggregate", "weather_condition_histogram"):
+            self._send(404, {"message": f"function {name} not found"})
+            return
+        with self.server.lock:
+            rows = [dict(r) for r in self.server.tables.get("weather_data", [])
+                    if r.get("locality_id") == args["p_locality_id"] and str(r.get("measurement_date")) >= args["p_since"]]
+        aggregator = SQLiteAggregator()
+        aggregator.insert_rows(rows)
+        if name == "weather_aggregate":
+            self._send(200, aggregator.aggregate(args["p_locality_id"], args["p_since"], args.get("p_bucket", "day")))
+        else:
+            histogram = aggregator.condition_histogram(args["p_locality_id"], args["p_since"])
+            self._send(200, [{"description": d, "records": n} for d, n in histogram.items()])
+
+    def do_GET(self):
+        self.server.request_count += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if self.server.failure_rate and self.server.rng.random() < self.server.failure_rate:
+            self._send(503, {"error": {"message": "injected failure"}})
+            return
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        q = params.get("q", "")
+        if url.path.endswith("/current.json"):
+            self._send(200, _weather_payload(q))
+        elif url.path.endswith("/history.json"):
+            self._send(200, _history_payload(q, params.get("dt", date.today().isoformat()), params.get("end_dt")))
+        else:
+            self._send(404, {"error": {"message": "Not found"}})
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _split_top_level(expr):
+    """Split a PostgREST logic expression on commas that are not inside parentheses or quotes."""
+    parts, depth, quoted, current = [], 0, False, ""
+    for ch in expr:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        if ch == "," and depth == 0 and not quoted:
+            parts.append(current)
+            current = ""
+        else:
+            current += ch
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _coerce(a, b):
+    try:
+        return float(a), float(b)
+    except (TypeError, ValueError):
+        return str(a), str(b)
+
+
+def _match(value, op, arg):
+    arg = arg.strip('"')
+    if op == "is":
+        return value is None if arg == "null" else str(value).lower() == arg
+    if op == "in":
+        options = [o.strip('"') for o in _split_top_level(arg.strip("()"))]
+        return any(_coerce(value, o)[0] == _coerce(value, o)[1] for o in options) if value is not None else False
+    if op in ("like", "ilike"):
+        pattern = arg.replace("*", "%")
+        text = "" if value is None else str(value)
+        if op == "ilike":
+            pattern, text = pattern.lower(), text.lower()
+        needle = pattern.strip("%")
+        if pattern.startswith("%") and pattern.endswith("%"):
+            return needle in text
+        if pattern.endswith("%"):
+            return text.startswith(needle)
+        if pattern.startswith("%"):
+            return text.endswith(needle)
+        return text == needle
+    if value is None:
+        return False
+    a, b = _coerce(value, arg)
+    return {"eq": a == b, "neq": a != b, "gt": a > b, "gte": a >= b, "lt": a < b, "lte": a <= b}[op]
+
+
+def _condition(text):
+    """Build a row predicate from `col.op.value`, `and(...)` or `or(...)`."""
+    if text.startswith(("and(", "or(")):
+        kind, _, inner = text.partition("(")
+        preds = [_condition(p) for p in _split_top_level(inner[:-1])]
+        return (lambda r: all(p(r) for p in preds)) if kind == "and" else (lambda r: any(p(r) for p in preds))
+    col, op, arg = text.split(".", 2)
+    return lambda r: _match(r.get(col), op, arg)
+
+
+class PostgRESTStubHandler(BaseHTTPRequestHandler):
+    """In-memory subset of the PostgREST API that supabase-py talks to.
+
+    Supports select with eq/neq/gt/gte/lt/lte/in/like/ilike/is filters, `or`,
+    order, limit and offset. It also supports inserts and upserts (on_conflict).
+    The weather_aggregate and weather_condition_histogram RPCs are answered by
+    aggregates.SQLiteAggregator over a copy of weather_data.
+    Tables and their auto-increment keys live on the server object.
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        if self.server.handshake_delay:
+            time.sleep(self.server.handshake_delay)
+
+    def _table(self):
+        url = urlparse(self.path)
+        return url.path.rsplit("/", 1)[-1], parse_qs(url.query, keep_blank_values=True)
+
+    def _delay(self):
+        self.server.request_count += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+    def _rpc(self, name, args):
+        from aggregates import SQLiteAggregator
+
+        if name not in ("weather_aggregate", "weather_condition_histogram"):
+            self._send(404, {"message": f"function {name} not found"})
+            return
+        with self.server.lock:
+            rows = [dict(r) for r in self.server.tables.get("weather_data", [])
+                    if r.get("locality_id") == args["p_locality_id"] and str(r.get("measurement_date")) >= args["p_since"]]
+        aggregator = SQLiteAggregator()
+        aggregator.insert_rows(rows)
+        if name == "weather_aggregate":
+            self._send(200, aggregator.aggregate(args["p_locality_id"], args["p_since"], args.get("p_bucket", "day")))
+        else:
+            histogram = aggregator.condition_histogram(args["p_locality_id"], args["p_since"])
+            self._send(200, [{"description": d, "records": n} for d, n in histogram.items()])
+
+    def do_GET(self):
+        self._delay()
+        name, query = self._table()
+        with self.server.lock:
+            rows = [dict(r) for r in self.server.tables.get(name, [])]
+        preds = []
+        for key, values in query.items():
+            for value in values:
+                if key in ("select", "order", "limit", "offset"):
+                    continue
+                preds.append(_condition(f"or({value[1:-1]})") if key == "or" else _condition(f"{key}.{value}"))
+        rows = [r for r in rows if all(p(r) for p in preds)]
+        for spec in reversed(query.get("order", [""])[0].split(",")):
+            if spec:
+                col, _, direction = spec.partition(".")
+                rows.sort(key=lambda r: (r.get(col) is None, _coerce(r.get(col), 0)[0]), reverse=direction.startswith("desc"))
+        offset = int(query.get("offset", ["0"])[0])
+        limit = query.get("limit")
+        rows = rows[offset:offset + int(limit[0])] if limit else rows[offset:]
+        select = query.get("select", ["*"])[0]
+        if select != "*":
+            cols = [c.strip() for c in select.split(",")]
+            rows = [{c: r.get(c) for c in cols} for r in rows]
+        self._send(200, rows)
+
+    def do_POST(self):
+        self._delay()
+        name, query = self._table()
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)) or 0)
+        if self.path.startswith("/rest/v1/rpc/"):
+            self._rpc(name, json.loads(body or b"{}"))
+            return
+        if self.server.failure_rate and self.server.rng.random() < self.server.failure_rate:
+            self._send(503, {"message": "injected failure"})
+            return
+        payload = json.loads(body or b"[]")
+        items = payload if isinstance(payload, list) else [payload]
+        conflict = query.get("on_conflict", [""])[0].split(",") if "merge-duplicates" in self.headers.get("Prefer", "") else None
+        key = self.server.primary_keys.get(name)
+        out = []
+        with self.server.lock:
+            table = self.server.tables.setdefault(name, [])
+            index = {tuple(str(r.get(c)) for c in conflict): r for r in table} if conflict else {}
+            for item in items:
+                existing = index.get(tuple(str(item.get(c)) for c in conflict)) if conflict else None
+                if existing is not None:
+                    existing.update(item)
+                    out.append(dict(existing))
+                    continue
+                row = dict(item)
+                if key and row.get(key) is None:
+                    self.server.sequence += 1
+                    row[key] = self.server.sequence
+                table.append(row)
+                if conflict:
+                    index[tuple(str(row.get(c)) for c in conflict)] = row
+                out.append(dict(row))
+        self._send(201, out)
+
+    _send = WeatherAPIStubHandler._send
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    request_queue_size = 128  # the default backlog of 5 stalls bursts of concurrent connects
+    daemon_threads = True
+
+
+class StubServer:
+    """Run a stub handler on a free localhost port in a background thread.
+
+    latency is added to every request; failure_rate is the share of requests
+    answered with a 503 (WeatherAPI GETs, PostgREST writes), drawn from a
+    generator seeded with `seed` so runs are repeatable.
+    """
+
+    def __init__(self, handler=WeatherAPIStubHandler, latency=0.0, handshake_delay=0.0, failure_rate=0.0, seed=0):
+        self.httpd = _Server(("127.0.0.1", 0), handler)
+        self.httpd.latency = latency
+        self.httpd.handshake_delay = handshake_delay
+        self.httpd.failure_rate = failure_rate
+        self.httpd.rng = random.Random(seed)
+        self.httpd.request_count = 0
+        # PostgREST stub state
+        self.httpd.lock = threading.Lock()
+        self.httpd.tables = {}
+        self.httpd.primary_keys = {"localities": "locality_id", "weather_data": "weather_id"}
+        self.httpd.sequence = 0
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def tables(self):
+        return self.httpd.tables
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -1,159 +1,491 @@
 from config import get_supabase_client
+import atexit
+from functools import cached_property
 from datetime import datetime, timedelta
-import pandas as pd
-from  weather_api import WeatherAPI
-from config import WEATHER_API_KEY, WEATHER_API_URL
-import requests
-import statistics
+from concurrent.futures import ThreadPoolExecutor
+from  weather_api import WeatherAPI, is_simulated, simulated_day
+from config import BACKFILL_CONCURRENCY, INSERT_CHUNK_SIZE, EXPORT_PAGE_SIZE, LOCAL_STORE_PATH, HOURLY_INGESTION
+from config import ROLLING_STATS, ROLLING_WINDOWS, ROLLING_FLUSH_INTERVAL
+from config import HISTORY_MAX_RANGE_DAYS, HISTORY_UNAVAILABLE_TTL, LOCALITY_SNAP_KM
+from config import WEATHER_UPSERT, WRITE_BEHIND, WRITE_BEHIND_BATCH, WRITE_BEHIND_INTERVAL, WRITE_BEHIND_SPILL
+from aggregates import SupabaseAggregator
+from locality_index import LocalityIndex
+from metrics import metrics, execute
+from export import export_history
+from local_store import LocalStore
+from hourly import HourlyDay, hourly_to_daily
+from rolling_stats import RollingStatsStore
+from write_behind import WriteBehindQueue, row_key
+from gap_planner import UnavailableRanges, plan_ranges, expand_range, is_unavailable, short_days
 
+# Columns the history views actually use; avoids select("*")
+WEATHER_COLUMNS = "weather_id, locality_id, measurement_date, temperature, humidity, description, wind_speed"
+
+@metrics.instrument("db")
 class SupabaseDB:
     def __init__(self):
-        self.client = get_supabase_client()
+        self.store = LocalStore(LOCAL_STORE_PATH) if LOCAL_STORE_PATH else None
+        self.unavailable = UnavailableRanges(self.store, ttl=HISTORY_UNAVAILABLE_TTL)
+        self.write_behind = None
+        if WRITE_BEHIND:
+            if not WEATHER_UPSERT:
+                print("⚠️ WRITE_BEHIND without WEATHER_UPSERT: rows replayed after a failure may be stored twice.")
+            self.write_behind = WriteBehindQueue(
+                self.insert_weather_bulk, WRITE_BEHIND_BATCH, WRITE_BEHIND_INTERVAL, WRITE_BEHIND_SPILL or None
+            )
+            atexit.register(self.write_behind.close)
+
+    # The Supabase connection and the objects built on it are created on first use,
+    # so commands that never reach the database don't pay for the SDK import and setup
+    @cached_property
+    def client(self):
+        return get_supabase_client()
+
+    @cached_property
+    def aggregator(self):
+        return SupabaseAggregator(self.client)
+
+    @cached_property
+    def localities(self):
+        return LocalityIndex(self.client)
+
+    @cached_property
+    def rolling(self):
+        if not ROLLING_STATS:
+            return None
+        rolling = RollingStatsStore(self.client, ROLLING_WINDOWS, ROLLING_FLUSH_INTERVAL, seed=self._rolling_seed)
+        atexit.register(self.flush_rolling_stats)
+        return rolling
     
     # Insert weather record
     def insert_weather(self, locality_id, temperature, humidity, description, wind_speed=None, measurement_date=None):
         if not measurement_date:
             measurement_date = datetime.now().isoformat()
         wind_speed = float(wind_speed) if wind_speed is not None else None
-        self.client.table("weather_data").insert({
+        row = {
             "locality_id": locality_id,
             "temperature": temperature,
             "humidity": humidity,
             "description": description,
             "wind_speed": wind_speed,
             "measurement_date": measurement_date
-        }).execute()
+        }
+        if self.write_behind:
+            self.write_behind.put(row)
+            return
+        self._write_weather(row)
+        self._update_rolling([row])
 
-    # Get last n days weather
-    def get_last_n_days(self, locality_id, days=7):
-        locality = self.get_locality_by_id(locality_id)
-        if not locality:
-            return []
+    # Upsert on (locality_id, measurement_date) where the unique index exists, else a plain insert
+    def _write_weather(self, rows):
+        table = self.client.table("weather_data")
+        execute(table.upsert(rows, on_conflict="locality_id,measurement_date") if WEATHER_UPSERT else table.insert(rows))
+
+    # Insert many weather records, chunk_size rows per request; with WEATHER_UPSERT a row for an
+    # existing (locality_id, measurement_date) replaces it instead of adding a duplicate
+    def insert_weather_bulk(self, rows, chunk_size=INSERT_CHUNK_SIZE):
+        if not rows:
+            return
+        deduped = {}
+        for r in rows:
+            wind = r.get("wind_speed")
+            row = {
+                "locality_id": r["locality_id"],
+                "temperature": r.get("temperature"),
+                "humidity": r.get("humidity"),
+                "description": r.get("description"),
+                "wind_speed": float(wind) if wind is not None else None,
+                "measurement_date": r.get("measurement_date") or datetime.now().isoformat()
+            }
+            # Postgres rejects an upsert that touches the same key twice, so the last row wins here
+            deduped.pop(row_key(row), None)
+            deduped[row_key(row)] = row
+        payload = list(deduped.values())
+        for start in range(0, len(payload), chunk_size):
+            self._write_weather(payload[start:start + chunk_size])
+        self._update_rolling(payload)
+
+    # Write out rows buffered by insert_weather so reads see them
+    def flush_write_behind(self):
+        if not self.write_behind:
+            return 0
+        try:
+            return self.write_behind.flush()
+        except Exception as e:
+            print(f"⚠️ Write-behind flush failed, will retry: {e}")
+            return 0
+
+    # Keep the rolling aggregates in step with stored rows
+    def _update_rolling(self, rows):
+        if not self.rolling:
+            return
+        try:
+            self.rolling.update(rows)
+            self.rolling.maybe_flush()
+        except Exception as e:
+            print(f"⚠️ Could not update rolling stats: {e}")
+
+    # Persist rolling stats changed since the last (throttled) flush
+    def flush_rolling_stats(self):
+        if "rolling" not in self.__dict__ or not self.rolling:
+            return 0
+        try:
+            return self.rolling.flush()
+        except Exception as e:
+            print(f"⚠️ Could not store rolling stats: {e}")
+            return 0
+
+    # Rows that seed a locality's rolling stats when none are stored; paged past the 1000-row cap
+    def _rolling_seed(self, locality_id, since):
+        return [r for page in self.iter_weather_pages([locality_id], since) for r in page]
 
+    # Re-seed a locality's rolling stats from weather_data, e.g. after rows were edited by hand
+    def rebuild_rolling_stats(self, locality_id):
+        if not self.rolling:
+            return
+        self.rolling.rebuild(locality_id)
+        self.rolling.flush()
+
+    # Rolling window stats (7/30/365 days by default) without scanning weather_data
+    def rolling_stats(self, locality_id, window=7):
+        if not self.rolling:
+            return None
+        return self.rolling.summary(locality_id, window)
+
+    # Store packed hourly days, one row per (locality_id, day); re-ingesting a day replaces it
+    def insert_hourly_bulk(self, locality_id, hourly_days, chunk_size=INSERT_CHUNK_SIZE):
+        payload = [d.to_row(locality_id) for d in hourly_days if len(d)]
+        for start in range(0, len(payload), chunk_size):
+            execute(self.client.table("weather_hourly").upsert(
+                payload[start:start + chunk_size], on_conflict="locality_id,measurement_date"
+            ))
+
+    # Get packed hourly days for the last n days
+    def get_hourly(self, locality_id, days=7):
         cutoff = (datetime.now() - timedelta(days=days-1)).date()
-        result = (
-            self.client.table("weather_data")
+        result = execute(
+            self.client.table("weather_hourly")
             .select("*")
             .eq("locality_id", locality_id)
             .gte("measurement_date", cutoff.isoformat())
             .order("measurement_date", desc=False)
-            .execute()
         )
-        records = result.data
-        existing_dates = {r["measurement_date"][:10]: r for r in records}
-
-        full_records = []
-        for i in range(days):
-            day = (datetime.now() - timedelta(days=days-1-i)).date().isoformat()
-            if day in existing_dates:
-                full_records.append(existing_dates[day])
-            else:
-                # Fetch historical from API
-                temp, hum, desc, wind = WeatherAPI.get_historical_weather(locality["latitude"], locality["longitude"], day)
-                self.insert_weather(locality_id, temp, hum, desc, wind_speed=wind, measurement_date=day)
-                full_records.append({
-                    "measurement_date": day,
-                    "temperature": temp,
-                    "humidity": hum,
-                    "description": desc,
-                    "wind_speed": float(wind)
-                })
-        return full_records
-
-    # Analyze trends
-    def analyze_weather(self, locality_id, days=7):
-        records = self.get_last_n_days(locality_id, days)
-        if not records:
-            return None
+        return [HourlyDay.from_row(r) for r in result.data]
 
-        temps = [r["temperature"] for r in records if r["temperature"] is not None]
-        hums = [r["humidity"] for r in records if r["humidity"] is not None]
-        conditions = [r["description"] for r in records if r.get("description")]
-        winds = []
-        for r in records:
-            w = r.get("wind_speed")
-            if w is None:
-                continue
+    # Daily records computed from stored hourly observations
+    def get_daily_from_hourly(self, locality_id, days=7):
+        return hourly_to_daily(self.get_hourly(locality_id, days))
+
+    # Fetch historical weather for the given days as date ranges, at most `concurrency` calls in flight
+    def backfill_days(self, locality, missing_days, concurrency=None):
+        concurrency = concurrency or BACKFILL_CONCURRENCY
+        ranges = self._plan_backfill(locality["locality_id"], missing_days)
+
+        def fetch(span):
             try:
-                winds.append(float(w))
-            except (ValueError, TypeError):
-                # skip values that can't be converted
+                return span, WeatherAPI.get_historical_range(locality["latitude"], locality["longitude"], *span), None
+            except Exception as e:
+                return span, {}, e
+
+        def fetch_all(spans):
+            if concurrency <= 1 or len(spans) <= 1:
+                return [fetch(span) for span in spans]
+            with ThreadPoolExecutor(max_workers=min(concurrency, len(spans))) as pool:
+                return list(pool.map(fetch, spans))
+
+        outcomes = fetch_all(ranges)
+        # Days a range call came back without are confirmed (or not) with single-day calls
+        outcomes += fetch_all([(day, day) for day in short_days(outcomes)])
+        return self.store_backfill(locality, self._collect_ranges(locality["locality_id"], outcomes))
+
+    # Merge the missing days into (start, end) ranges, leaving out days known to have no history
+    def _plan_backfill(self, locality_id, missing_days):
+        return plan_ranges(self.unavailable.filter(locality_id, missing_days), HISTORY_MAX_RANGE_DAYS)
+
+    # Turn ((start, end), results, error) outcomes into (day, result) pairs for store_backfill.
+    # Days lost to an outage are filled with simulated values, which are not stored. A day is only
+    # recorded as having no data when a single-day call says so; the days a range call didn't
+    # return come back as single-day outcomes of their own (see gap_planner.short_days)
+    def _collect_ranges(self, locality_id, outcomes):
+        fetched = []
+        absent = []
+        for (start, end), results, error in outcomes:
+            days = expand_range(start, end)
+            if error is not None and not is_unavailable(error):
+                print(f"⚠️ Failed to fetch historical data for {start}..{end}: {error}")
+                fetched.extend((day, simulated_day()) for day in days)
                 continue
+            if start == end and start not in results:
+                absent.append(start)
+            fetched.extend((day, results[day]) for day in days if day in results)
+        for gap_start, gap_end in plan_ranges(absent, HISTORY_MAX_RANGE_DAYS):
+            self.unavailable.add(locality_id, gap_start, gap_end)
+        if absent:
+            print(f"ℹ️ No history available for {len(absent)} day(s); skipping them")
+        return sorted(fetched, key=lambda pair: pair[0])
 
-        analysis = {
-            "records": len(records),
-            # Temperature
-            "temp_avg": round(sum(temps)/len(temps), 2) if temps else None,
-            "temp_min": min(temps) if temps else None,
-            "temp_max": max(temps) if temps else None,
-            "temp_range": round(max(temps)-min(temps), 2) if temps else None,
-            "temp_std": round(statistics.stdev(temps), 2) if len(temps) > 1 else 0,
-            "temp_trend": "Increasing" if temps[-1] > temps[0] else "Decreasing" if temps[-1] < temps[0] else "Stable",
-            # Humidity
-            "hum_avg": round(sum(hums)/len(hums), 2) if hums else None,
-            "hum_min": min(hums) if hums else None,
-            "hum_max": max(hums) if hums else None,
-            "hum_range": round(max(hums)-min(hums), 2) if hums else None,
-            "hum_std": round(statistics.stdev(hums), 2) if len(hums) > 1 else 0,
-            # Wind
-            "wind_avg": round(sum(winds)/len(winds), 2) if winds else None,
-            "wind_min": min(winds) if winds else None,
-            "wind_max": max(winds) if winds else None,
-            "wind_std": round(statistics.stdev(winds), 2) if len(winds) > 1 else 0,
-            # Conditions
-            "most_common_condition": max(set(conditions), key=conditions.count) if conditions else None,
-            "condition_counts": {c: conditions.count(c) for c in set(conditions)} if conditions else {},
-            # Extremes
-            "extreme_temp_days": [r["measurement_date"] for r in records if r["temperature"] is not None and (r["temperature"] > 35 or r["temperature"] < 5)],
-            "extreme_hum_days": [r["measurement_date"] for r in records if r["humidity"] is not None and (r["humidity"] > 90 or r["humidity"] < 20)]
-        }
+    # Store (day, get_historical_day result) pairs fetched for a locality; returns the daily rows.
+    # Simulated fallbacks are returned for display, flagged "simulated", but not stored, so the day is
+    # fetched again next time
+    def store_backfill(self, locality, fetched):
+        rows = []
+        simulated = set()
+        for day, result in fetched:
+            temp, hum, desc, wind, _ = result
+            rows.append({
+                "locality_id": locality["locality_id"],
+                "measurement_date": day,
+                "temperature": temp,
+                "humidity": hum,
+                "description": desc,
+                "wind_speed": float(wind)
+            })
+            if is_simulated(result):
+                simulated.add(day)
+                rows[-1]["simulated"] = True
 
-        return analysis
+        # The hourly array comes in the same response, so keeping it costs no extra API calls
+        if HOURLY_INGESTION:
+            hourly_days = [result[4] for _, result in fetched if result[4] is not None]
+            try:
+                self.insert_hourly_bulk(locality["locality_id"], hourly_days)
+            except Exception as e:
+                print(f"⚠️ Could not store hourly observations: {e}")
 
+        real = [r for r in rows if r["measurement_date"] not in simulated]
+        if simulated:
+            print(f"⚠️ {len(simulated)} day(s) unavailable from WeatherAPI; showing simulated values, not storing them")
+        if not self.store:
+            self.insert_weather_bulk(real)
+            return rows
+
+        # Finished days are kept locally first, so they survive a failed remote insert
+        today = datetime.now().date().isoformat()
+        finished = [r for r in real if r["measurement_date"] < today]
+        self.store.put_many(finished, synced=False)
+        try:
+            self.insert_weather_bulk(real)
+            self.store.mark_synced(finished)
+        except Exception as e:
+            print(f"⚠️ Could not store backfilled days remotely, will retry on next sync: {e}")
+        return rows
+
+    # Push locally stored rows that have not reached Supabase yet
+    def flush_local_store(self):
+        if not self.store:
+            return 0
+        return self.store.flush(self.insert_weather_bulk)
+
+    # Get last n days weather
+    def get_last_n_days(self, locality_id, days=7, concurrency=None, resolution="daily"):
+        locality = self.get_locality_by_id(locality_id)
+        if not locality:
+            return []
+
+        window = self._window(days)
+        existing_dates = self.stored_days(locality_id, window)
+        missing_days = [day for day in window if day not in existing_dates]
+
+        # Fetch missing days from the history API in parallel, then store them in one insert
+        backfilled = self.backfill_days(locality, missing_days, concurrency=concurrency) if missing_days else []
+        return self._assemble(locality_id, days, window, existing_dates, backfilled, resolution)
+
+    # ISO dates of the last n days, oldest first
+    @staticmethod
+    def _window(days):
+        return [(datetime.now() - timedelta(days=days-1-i)).date().isoformat() for i in range(days)]
+
+    # Stored rows for the window keyed by day: finished days from the local tier, the rest from Supabase
+    def stored_days(self, locality_id, window):
+        today = window[-1]
+        existing_dates = {}
+        self.flush_write_behind()
+        if self.store:
+            if self.store.has_pending():
+                try:
+                    self.flush_local_store()
+                except Exception as e:
+                    print(f"⚠️ Local store sync failed, will retry: {e}")
+            existing_dates = self.store.get_range(locality_id, window[0], today)
+            existing_dates.pop(today, None)
+
+        remote_days = [day for day in window if day not in existing_dates]
+        if remote_days:
+            result = execute(
+                self.client.table("weather_data")
+                .select(WEATHER_COLUMNS)
+                .eq("locality_id", locality_id)
+                .gte("measurement_date", remote_days[0])
+                .order("measurement_date", desc=False)
+            )
+            remote_dates = {r["measurement_date"][:10]: r for r in result.data}
+            if self.store:
+                self.store.put_many([r for day, r in remote_dates.items() if day < today])
+            existing_dates.update(remote_dates)
+        return existing_dates
+
+    # Rows are parsed into a WeatherBatch here, once, instead of by every caller
+    def _assemble(self, locality_id, days, window, existing_dates, backfilled, resolution):
+        from records import WeatherBatch  # numpy
+
+        fetched = {row["measurement_date"]: row for row in backfilled}
+
+        # days with no upstream history are absent from both
+        records = [existing_dates[day] if day in existing_dates else fetched[day]
+                   for day in window if day in existing_dates or day in fetched]
+        if resolution == "hourly":
+            records = self._expand_hourly(locality_id, days, records)
+        return WeatherBatch.from_rows(records)
+
+    # Replace each daily record with its hourly observations where they were ingested
+    def _expand_hourly(self, locality_id, days, records):
+        hourly = {d.measurement_date: d for d in self.get_hourly(locality_id, days)}
+        expanded = []
+        for r in records:
+            day = hourly.get(str(r["measurement_date"])[:10])
+            if day is not None and len(day):
+                expanded.extend(day.records())
+            else:
+                expanded.append(r)
+        return expanded
+
+    # Backfill missing days in the window without pulling the stored rows; returns days filled
+    def fill_missing_days(self, locality_id, days=7, concurrency=None):
+        locality = self.get_locality_by_id(locality_id)
+        if not locality:
+            return 0
+
+        cutoff = (datetime.now() - timedelta(days=days-1)).date()
+        # paged, so windows longer than PostgREST's 1000-row cap still see every stored day
+        pages = self.iter_weather_pages([locality_id], cutoff, columns="weather_id,measurement_date")
+        existing = {r.measurement_date.isoformat()[:10] for page in pages for r in page}
+        window = [(datetime.now() - timedelta(days=days-1-i)).date().isoformat() for i in range(days)]
+        missing_days = [day for day in window if day not in existing]
+        if missing_days:
+            self.backfill_days(locality, missing_days, concurrency=concurrency)
+        return len(missing_days)
+
+    # Page through weather_data ordered by (measurement_date, weather_id) using keyset pagination;
+    # each page is a list of WeatherRecords. `columns` must include both keys
+    def iter_weather_pages(self, locality_ids, since, until=None, page_size=EXPORT_PAGE_SIZE, columns=WEATHER_COLUMNS):
+        from records import WeatherRecord  # numpy
+
+        self.flush_write_behind()
+        last = None
+        while True:
+            query = (
+                self.client.table("weather_data")
+                .select(columns)
+                .in_("locality_id", list(locality_ids))
+                .gte("measurement_date", str(since))
+            )
+            if until:
+                query = query.lte("measurement_date", str(until))
+            if last:
+                query = query.or_(
+                    f'measurement_date.gt."{last["measurement_date"]}",'
+                    f'and(measurement_date.eq."{last["measurement_date"]}",weather_id.gt.{last["weather_id"]})'
+                )
+            with metrics.span("db.iter_weather_pages"):  # one span per page; see Metrics.instrument
+                page = execute(query.order("measurement_date").order("weather_id").limit(page_size)).data
+            if not page:
+                return
+            yield [WeatherRecord.from_row(r) for r in page]
+            if len(page) < page_size:
+                return
+            last = page[-1]
+
+    # Analyze trends. With resolution="hourly", days that have hourly observations are analysed
+    # on daily values aggregated from them (see hourly_to_daily) instead of the API's daily summary
+    def analyze_weather(self, locality_id, days=7, resolution="daily"):
+        from analytics import analyze_records  # numpy
 
-    # Export to CSV
-    def export_csv(self, locality_id, days=7, filename="weather_history.csv"):
         records = self.get_last_n_days(locality_id, days)
-        if not records:
+        if resolution == "hourly":
+            from_hourly = {d["measurement_date"]: d for d in self.get_daily_from_hourly(locality_id, days)}
+            records = [from_hourly.get(r.measurement_date.isoformat()[:10], r) for r in records]
+        return analyze_records(records)
+
+
+    # Grouped stats computed in the database; bucket is day, week, month or all
+    def aggregate_weather(self, locality_id, days=7, bucket="day"):
+        since = (datetime.now() - timedelta(days=days-1)).date()
+        return self.aggregator.aggregate(locality_id, since, bucket=bucket)
+
+    # Record count per condition, computed in the database
+    def condition_histogram(self, locality_id, days=7):
+        since = (datetime.now() - timedelta(days=days-1)).date()
+        return self.aggregator.condition_histogram(locality_id, since)
+
+    # Export to CSV (streamed page by page, so the window can be arbitrarily long)
+    def export_csv(self, locality_id, days=7, filename="weather_history.csv"):
+        self.fill_missing_days(locality_id, days)
+        count = export_history(self, [locality_id], days, filename)
+        if not count:
             print("No records to export.")
             return
-        df = pd.DataFrame(records)
-        df.to_csv(filename, index=False)
-        print(f"Exported {len(records)} records → {filename}")
+        print(f"Exported {count} records → {filename}")
 
-    # Get locality by name
+    # Get locality by name (served from the in-memory index; only new rows are fetched on a miss)
     def get_locality_by_name(self, name: str):
-        result = (
-            self.client.table("localities")
-            .select("*")
-            .ilike("locality_name", f"%{name}%")
-            .execute()
-        )
-        data = result.data
-        return data[0] if data else None
+        locality = self.localities.find(name)
+        if locality is None and self.localities.refresh():
+            locality = self.localities.find(name)
+        return locality
+
+    def suggest_localities(self, name, limit=3):
+        """Names close to one that was not found, for a "did you mean" hint."""
+        return [loc["locality_name"] for loc in self.localities.find_fuzzy(name, limit=limit)]
+
+    # Get all localities, optionally filtered by name substring or IDs
+    def get_localities(self, name_filter=None, locality_ids=None):
+        query = self.client.table("localities").select("*")
+        if name_filter:
+            query = query.ilike("locality_name", f"%{name_filter}%")
+        if locality_ids:
+            query = query.in_("locality_id", list(locality_ids))
+        return execute(query.order("locality_id")).data
+
+    def insert_locality(self, name, latitude, longitude, snap_km=LOCALITY_SNAP_KM):
+        """Insert a new locality into the database and return its row.
 
-    def insert_locality(self, name, latitude, longitude):
-        """Insert a new locality into the database."""
-        self.client.table("localities").insert({
+        If an existing locality lies within snap_km (e.g. "Bengaluru" vs "Bangalore",
+        which resolve to the same coordinates), that row is returned instead, so the
+        place isn't ingested and backfilled twice.
+        """
+        if snap_km:
+            self.localities.refresh()
+            near = self.localities.nearest(latitude, longitude, max_km=snap_km)
+            if near:
+                return near[0]
+        result = execute(self.client.table("localities").insert({
             "locality_name": name,
             "latitude": latitude,
             "longitude": longitude
-        }).execute()
+        }))
+        if result.data:
+            self.localities.add(result.data[0])
+            return result.data[0]
+        self.localities.invalidate()
+        return self.get_locality_by_name(name)
+
+    # Closest stored locality to the coordinates, as (locality, distance_km), optionally within max_km
+    def nearest_locality(self, latitude, longitude, max_km=None):
+        near = self.localities.nearest(latitude, longitude, max_km=max_km)
+        if near is None and self.localities.refresh():
+            near = self.localities.nearest(latitude, longitude, max_km=max_km)
+        return near
+
+    # Stored localities within radius_km of the coordinates, as [(locality, distance_km)], closest first
+    def localities_within(self, latitude, longitude, radius_km):
+        return self.localities.within(latitude, longitude, radius_km)
 
     def get_coordinates_from_api(self, name):
         """Fetch coordinates for a city using WeatherAPI."""
-        try:
-            params = {"key": WEATHER_API_KEY, "q": name}
-            response = requests.get(WEATHER_API_URL, params=params, timeout=5)
-            response.raise_for_status()
-            data = response.json()
-            lat = data["location"]["lat"]
-            lon = data["location"]["lon"]
-            return {"latitude": lat, "longitude": lon}
-        except Exception as e:
-            print(f"⚠️ Failed to get coordinates for '{name}': {e}")
-            return None
+        return WeatherAPI.get_coordinates(name)
         
     def get_locality_by_id(self, locality_id):
-        result = self.client.table("localities").select("*").eq("locality_id", locality_id).execute()
-        return result.data[0] if result.data else None
\ No newline at end of file
+        locality = self.localities.get(locality_id)
+        if locality is None and self.localities.refresh():
+            locality = self.localities.get(locality_id)
+        return locality
@@ -0,0 +1,106 @@
+"""SQLiteAggregator checked against a plain-Python version of sql/weather_aggregates.sql."""
+import statistics
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from fractions import Fraction
+
+import pytest
+
+from aggregates import SQLiteAggregator
+
+SINCE = date(2026, 1, 20)
+PREFIX = {"temperature": "temp", "humidity": "hum", "wind_speed": "wind"}
+
+
+def _rows():
+    rows = []
+    for i in range(45):
+        day = SINCE + timedelta(days=i)
+        readings = 1 if i % 4 == 0 else 2  # some days hold a single reading (stddev over n=1)
+        for j in range(readings):
+            rows.append({
+                "locality_id": 1,
+                "measurement_date": day.isoformat(),
+                "temperature": 15 + (i * 7 + j * 3) % 13 + 0.25 * j,
+                "humidity": None if i % 5 == 0 else 40 + (i * 11 + j) % 50,
+                "wind_speed": None,
+                "description": "Sunny" if i % 3 else "Light rain",
+            })
+    # outside the window, and another locality
+    rows.append({"locality_id": 1, "measurement_date": (SINCE - timedelta(days=1)).isoformat(), "temperature": 99})
+    rows.append({"locality_id": 2, "measurement_date": SINCE.isoformat(), "temperature": -99})
+    return rows
+
+
+def _round(value):
+    # numeric round() in Postgres: exact value, halves away from zero
+    value = Fraction(value)
+    return float((Decimal(value.numerator) / Decimal(value.denominator)).quantize(Decimal("0.01"), ROUND_HALF_UP))
+
+
+def _bucket(day, bucket):
+    if bucket == "day":
+        return day
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return SINCE
+
+
+def _reference(rows, locality_id, since, bucket):
+    groups = defaultdict(list)
+    for r in rows:
+        day = date.fromisoformat(r["measurement_date"])
+        if r["locality_id"] == locality_id and day >= since:
+            groups[_bucket(day, bucket)].append(r)
+    out = []
+    for key in sorted(groups):
+        group = groups[key]
+        row = {"bucket": key.isoformat(), "records": len(group)}
+        for col, prefix in PREFIX.items():
+            values = [r[col] for r in group if r.get(col) is not None]
+            row[f"{prefix}_avg"] = _round(statistics.mean(map(Fraction, values))) if values else None
+            row[f"{prefix}_min"] = min(values, default=None)
+            row[f"{prefix}_max"] = max(values, default=None)
+            row[f"{prefix}_std"] = _round(statistics.stdev(values)) if len(values) > 1 else 0
+        out.append(row)
+    return out
+
+
+@pytest.fixture
+def aggregator():
+    agg = SQLiteAggregator()
+    agg.insert_rows(_rows())
+    return agg
+
+
+@pytest.mark.parametrize("bucket", ["day", "week", "month", "all"])
+def test_aggregate_matches_reference(aggregator, bucket):
+    assert aggregator.aggregate(1, SINCE, bucket=bucket) == _reference(_rows(), 1, SINCE, bucket)
+
+
+def test_single_reading_has_zero_stddev(aggregator):
+    first = aggregator.aggregate(1, SINCE, bucket="day")[0]
+    assert first["records"] == 1
+    assert first["temp_std"] == 0
+    assert first["hum_avg"] is None and first["hum_std"] == 0
+
+
+def test_weeks_start_on_monday(aggregator):
+    weeks = aggregator.aggregate(1, SINCE, bucket="week")
+    assert all(date.fromisoformat(w["bucket"]).weekday() == 0 for w in weeks)
+
+
+def test_condition_histogram(aggregator):
+    expected = defaultdict(int)
+    for r in _rows():
+        if r["locality_id"] == 1 and r["measurement_date"] >= SINCE.isoformat() and r.get("description"):
+            expected[r["description"]] += 1
+    assert aggregator.condition_histogram(1, SINCE) == dict(expected)
+
+
+def test_unknown_bucket(aggregator):
+    with pytest.raises(ValueError):
+        aggregator.aggregate(1, SINCE, bucket="year")
@@ -1,23 +1,22 @@
-import matplotlib.pyplot as plt
 import numpy as np
 import streamlit as st
+from metrics import metrics
+from charts import render_weather_chart
+from records import as_batch
 
+@metrics.timed("plot.analyze_and_plot_weather")
 def analyze_and_plot_weather(records, locality_name):
     if not records:
         st.warning("❌ No records found for analysis.")
         return
 
     # --- Extract data ---
-    temps = [r["temperature"] for r in records]
-    hums = [r["humidity"] for r in records]
-    winds = [float(r["wind_speed"]) for r in records]
-    descs = [r["description"] for r in records]
-    dates = [
-        r["measurement_date"].strftime("%Y-%m-%d") 
-        if hasattr(r["measurement_date"], "strftime") 
-        else str(r["measurement_date"]).split("T")[0]  # remove timestamp if string
-        for r in records
-    ]
+    batch = as_batch(records)
+    temps = batch.values("temperature")
+    hums = batch.values("humidity")
+    winds = batch.values("wind_speed")
+    descs = batch.description
+    dates = batch.date_strings().tolist()
 
     # --- Basic stats ---
     avg_temp, min_temp, max_temp = np.mean(temps), np.min(temps), np.max(temps)
@@ -41,26 +40,8 @@ def analyze_and_plot_weather(records, locality_name):
     st.markdown(f"☔ **Rain Days** → {rain_days}/{len(records)} days had rain")
 
     # --- Plot Graph ---
-    fig, ax = plt.subplots(figsize=(10,6))
-    
-    ax.plot(dates, temps, marker='o', label="Temperature (°C)")
-    ax.plot(dates, hums, marker='s', label="Humidity (%)")
-    ax.plot(dates, winds, marker='^', label="Wind Speed (kmph)")
-
-    # Annotate each point with its value
-    for i, (t, h, w) in enumerate(zip(temps, hums, winds)):
-        ax.text(dates[i], t, f"{t:.1f}", ha='center', va='bottom', fontsize=8)
-        ax.text(dates[i], h, f"{h:.1f}", ha='center', va='bottom', fontsize=8)
-        ax.text(dates[i], w, f"{w:.1f}", ha='center', va='bottom', fontsize=8)
-
-    ax.set_xticks(range(len(dates)))
-    ax.set_xticklabels(dates, rotation=30)
-    ax.set_xlabel("Date")
-    ax.set_ylabel("Values")
-    ax.set_title(f"Weather Trends for {locality_name}")
-    ax.legend()
-    ax.grid(True)
-    plt.tight_layout()
-
-    # Display in Streamlit
-    st.pyplot(fig)
+    render_weather_chart(
+        dates,
+        {"Temperature (°C)": temps, "Humidity (%)": hums, "Wind Speed (kmph)": winds},
+        f"Weather Trends for {locality_name}",
+    )
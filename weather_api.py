@@ -1,44 +1,237 @@
-import requests
 import random
-from config import WEATHER_API_KEY, WEATHER_API_URL
+import time
+from datetime import date as date_cls, datetime, timezone
+from email.utils import parsedate_to_datetime
+import requests
+from config import WEATHER_API_KEY, WEATHER_API_URL, CACHE_MAXSIZE, CURRENT_WEATHER_TTL, CACHE_COORD_PRECISION
+from config import API_RATE_LIMIT, API_MAX_RETRY_AFTER, BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT
+from http_client import get_transport
+from cache import TTLCache
+from metrics import metrics
+from hourly import HourlyDay
+from ratelimit import AdaptiveRateLimiter
+from circuit_breaker import CircuitBreaker
+from gap_planner import expand_range
+
+
+class SimulatedReading(tuple):
+    """Random stand-in values returned when the API is unavailable; never cached or stored."""
+    simulated = True
+
+
+def is_simulated(reading):
+    return getattr(reading, "simulated", False)
+
+
+def simulated_reading():
+    """Random (temperature, humidity, "Simulated", wind) flagged as simulated, for when the API is down."""
+    temp = round(random.uniform(15, 35), 2)
+    hum = random.randint(30, 90)
+    wind = round(random.uniform(0, 20), 2)
+    return SimulatedReading((temp, hum, "Simulated", wind))
 
+
+def simulated_day():
+    """A simulated history day in get_historical_day's shape (no hourly observations)."""
+    return SimulatedReading((*simulated_reading(), None))
+
+
+@metrics.instrument("api")
 class WeatherAPI:
+    # Current conditions expire quickly; finished days never change, so they never expire
+    current_cache = TTLCache(maxsize=CACHE_MAXSIZE, ttl=CURRENT_WEATHER_TTL)
+    history_cache = TTLCache(maxsize=CACHE_MAXSIZE, ttl=None)
+
+    # Shared by the sync and async clients
+    limiter = AdaptiveRateLimiter(API_RATE_LIMIT)
+    breaker = CircuitBreaker("api", failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT)
+
+    @staticmethod
+    def _coord_key(latitude, longitude):
+        return (round(float(latitude), CACHE_COORD_PRECISION), round(float(longitude), CACHE_COORD_PRECISION))
+
+    @staticmethod
+    def cache_stats():
+        return {"current": WeatherAPI.current_cache.stats(), "history": WeatherAPI.history_cache.stats()}
+
+    @staticmethod
+    def upstream_stats():
+        return {"circuit": WeatherAPI.breaker.stats(), "rate_limit": round(WeatherAPI.limiter.rate, 2)}
+
+    @staticmethod
+    def clear_cache():
+        WeatherAPI.current_cache.clear()
+        WeatherAPI.history_cache.clear()
+
+    @staticmethod
+    def _url(endpoint):
+        # WEATHER_API_URL points at current.json; other endpoints live next to it
+        return WEATHER_API_URL if endpoint == "current" else WEATHER_API_URL.replace("current", endpoint)
+
+    @staticmethod
+    def _retry_after(headers):
+        value = headers.get("Retry-After")
+        if not value:
+            return 1.0
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return 1.0
+
+    @staticmethod
+    def _on_error_status(status, headers):
+        """Update the limiter/breaker for an error response; True if the request should be retried."""
+        if status == 429:
+            retry_after = WeatherAPI._retry_after(headers)
+            WeatherAPI.limiter.throttle(retry_after)
+            if retry_after > API_MAX_RETRY_AFTER:
+                WeatherAPI.breaker.trip(retry_after)
+                return False
+            WeatherAPI.breaker.record_success()  # reachable, just busy
+            return True
+        if status >= 500:
+            WeatherAPI.breaker.record_failure()
+        else:
+            WeatherAPI.breaker.record_success()  # e.g. unknown location: the API itself is fine
+        return False
+
+    @staticmethod
+    def _request(endpoint, q, **params):
+        params = {"key": WEATHER_API_KEY, "q": q, **params}
+        for attempt in range(2):
+            WeatherAPI.breaker.before_call()
+            wait = WeatherAPI.limiter.reserve()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                data = get_transport().get_json(WeatherAPI._url(endpoint), params=params)
+            except requests.HTTPError as e:
+                response = e.response
+                if WeatherAPI._on_error_status(response.status_code, response.headers) and attempt == 0:
+                    continue
+                raise
+            except Exception:
+                WeatherAPI.breaker.record_failure()
+                raise
+            WeatherAPI.breaker.record_success()
+            WeatherAPI.limiter.on_success()
+            return data
+
+    @staticmethod
+    def _history_key(latitude, longitude, date):
+        return (*WeatherAPI._coord_key(latitude, longitude), str(date))
+
+    @staticmethod
+    def _history_ttl(date):
+        # Today's figures are still moving, so only past days are cached permanently
+        return None if str(date) < date_cls.today().isoformat() else CURRENT_WEATHER_TTL
+
+    @staticmethod
+    def _parse_current(data):
+        temp = data["current"]["temp_c"]
+        hum = data["current"]["humidity"]
+        desc = data["current"]["condition"]["text"]
+        wind = data["current"]["wind_kph"]  # add wind speed
+        return temp, hum, desc, wind
+
+    @staticmethod
+    def _parse_history(data):
+        return WeatherAPI._parse_forecastday(data["forecast"]["forecastday"][0])
+
+    @staticmethod
+    def _parse_forecastday(forecastday):
+        day = forecastday["day"]
+        temp = day["avgtemp_c"]
+        hum = day["avghumidity"]
+        desc = day["condition"]["text"]
+        wind = day["maxwind_kph"]
+        hours = HourlyDay.from_forecastday(forecastday) if forecastday.get("hour") else None
+        return temp, hum, desc, wind, hours
+
+    @staticmethod
+    def _parse_location(data):
+        lat = data["location"]["lat"]
+        lon = data["location"]["lon"]
+        return {"latitude": lat, "longitude": lon}
+
     @staticmethod
     def get_weather(latitude, longitude):
+        key = WeatherAPI._coord_key(latitude, longitude)
+        cached = WeatherAPI.current_cache.get(key)
+        if cached is not None:
+            return cached
         try:
-            params = {"key": WEATHER_API_KEY, "q": f"{latitude},{longitude}"}
-            response = requests.get(WEATHER_API_URL, params=params, timeout=5)
-            response.raise_for_status()
-            data = response.json()
-            temp = data["current"]["temp_c"]
-            hum = data["current"]["humidity"]
-            desc = data["current"]["condition"]["text"]
-            wind = data["current"]["wind_kph"]  # add wind speed
-            return temp, hum, desc, wind
+            reading = WeatherAPI._parse_current(WeatherAPI._request("current", f"{latitude},{longitude}"))
+            WeatherAPI.current_cache.set(key, reading)
+            return reading
         except Exception as e:
             print(f"API failed: {e}, using simulated data.")
-            temp = round(random.uniform(15, 35), 2)
-            hum = random.randint(30, 90)
-            wind = round(random.uniform(0, 20), 2)
-            return temp, hum, "Simulated", wind
+            return simulated_reading()
 
     @staticmethod
     def get_historical_weather(latitude, longitude, date):
+        day = WeatherAPI.get_historical_day(latitude, longitude, date)
+        return SimulatedReading(day[:4]) if is_simulated(day) else day[:4]
+
+    @staticmethod
+    def get_historical_day(latitude, longitude, date):
+        """Daily summary plus the hourly observations (HourlyDay, or None) from one history call."""
+        key = WeatherAPI._history_key(latitude, longitude, date)
+        cached = WeatherAPI.history_cache.get(key)
+        if cached is not None:
+            return cached
         try:
-            url = WEATHER_API_URL.replace("current", "history")
-            params = {"key": WEATHER_API_KEY, "q": f"{latitude},{longitude}", "dt": date}
-            response = requests.get(url, params=params, timeout=5)
-            response.raise_for_status()
-            data = response.json()
-            temp = data["forecast"]["forecastday"][0]["day"]["avgtemp_c"]
-            hum = data["forecast"]["forecastday"][0]["day"]["avghumidity"]
-            desc = data["forecast"]["forecastday"][0]["day"]["condition"]["text"]
-            wind = data["forecast"]["forecastday"][0]["day"]["maxwind_kph"]
-            return temp, hum, desc, wind
+            result = WeatherAPI._parse_history(WeatherAPI._request("history", f"{latitude},{longitude}", dt=date))
+            WeatherAPI.history_cache.set(key, result, ttl=WeatherAPI._history_ttl(date))
+            return result
         except Exception as e:
             print(f"⚠️ Failed to fetch historical data for {date}: {e}")
-            import random
-            temp = round(random.uniform(15, 35), 2)
-            hum = random.randint(30, 90)
-            wind = round(random.uniform(0, 20), 2)
-            return temp, hum, "Simulated", wind
+            return simulated_day()
+
+    @staticmethod
+    def get_historical_range(latitude, longitude, start, end):
+        """get_historical_day results for start..end inclusive from one history call (dt/end_dt), keyed by date.
+
+        Days the provider doesn't return are absent from the result. Raises if the call fails.
+        """
+        keys, cached = WeatherAPI._cached_range(latitude, longitude, start, end)
+        if cached is not None:
+            return cached
+        data = WeatherAPI._request("history", f"{latitude},{longitude}", **WeatherAPI._range_params(start, end))
+        return WeatherAPI._cache_forecastdays(data, keys)
+
+    @staticmethod
+    def _cached_range(latitude, longitude, start, end):
+        """Cache keys for each day of the range, and the cached results if every day is cached (else None)."""
+        keys = {day: WeatherAPI._history_key(latitude, longitude, day) for day in expand_range(start, end)}
+        cached = {day: WeatherAPI.history_cache.get(key) for day, key in keys.items()}
+        return keys, cached if all(result is not None for result in cached.values()) else None
+
+    @staticmethod
+    def _range_params(start, end):
+        return {"dt": start} if start == end else {"dt": start, "end_dt": end}
+
+    @staticmethod
+    def _cache_forecastdays(data, keys):
+        results = {}
+        for forecastday in data["forecast"]["forecastday"]:
+            day = forecastday["date"]
+            if day not in keys:
+                continue
+            result = WeatherAPI._parse_forecastday(forecastday)
+            WeatherAPI.history_cache.set(keys[day], result, ttl=WeatherAPI._history_ttl(day))
+            results[day] = result
+        return results
+
+    @staticmethod
+    def get_coordinates(name):
+        """Resolve a place name to coordinates using the current-weather endpoint."""
+        try:
+            return WeatherAPI._parse_location(WeatherAPI._request("current", name))
+        except Exception as e:
+            print(f"⚠️ Failed to get coordinates for '{name}': {e}")
+            return None
@@ -0,0 +1,260 @@
+"""Write-behind buffer for single-row weather inserts.
+
+insert_weather() puts rows here instead of making one HTTP insert each; a
+background thread pushes them in multi-row batches when max_batch rows are
+waiting or interval seconds have passed since the oldest one arrived. Rows are
+keyed on (locality_id, measurement_date) so a later row for the same key
+replaces the queued one, and every accepted row is appended to a spill file,
+so nothing is lost if the process dies before a flush.
+
+Each process spills to its own file (`spill_path` with the pid added) and
+holds an exclusive lock on `<file>.lock` while it runs. On start a queue
+claims the spill files whose lock nobody holds, i.e. those left by processes
+that died, and takes over their rows. Where fcntl is unavailable only the
+process's own file is replayed.
+"""
+import glob
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from metrics import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+KEY_COLUMNS = ("locality_id", "measurement_date")
+
+
+def row_key(row):
+    return tuple(str(row.get(c)) for c in KEY_COLUMNS)
+
+
+def _process_path(base_path):
+    root, ext = os.path.splitext(base_path)
+    return f"{root}.{os.getpid()}{ext}"
+
+
+def _spill_files(base_path):
+    """Spill files of every process sharing base_path, including one written before files were per process."""
+    root, ext = os.path.splitext(base_path)
+    return sorted(set(glob.glob(glob.escape(root) + ".*" + ext)) | ({base_path} if os.path.exists(base_path) else set()))
+
+
+def _try_lock(path):
+    """The open lock file for a spill file if no other process holds it, else None."""
+    if fcntl is None:
+        return None
+    lock = open(path + ".lock", "a")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        return None
+    try:
+        # The previous holder may have removed the lock file after we opened it
+        if os.fstat(lock.fileno()).st_ino != os.stat(lock.name).st_ino:
+            raise FileNotFoundError(lock.name)
+    except FileNotFoundError:
+        lock.close()
+        return None
+    return lock
+
+
+def _read_spill(path):
+    rows = []
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    continue  # torn final line from a crash mid-write
+    except FileNotFoundError:
+        pass
+    return rows
+
+
+def _remove_spill(path, lock):
+    """Delete a spill file and its lock file, then release the lock (the caller holds it)."""
+    for name in (path, path + ".lock"):
+        try:
+            os.remove(name)
+        except FileNotFoundError:
+            pass
+    if lock:
+        lock.close()
+
+
+class WriteBehindQueue:
+    def __init__(self, flush_rows, max_batch=500, interval=2.0, spill_path=None):
+        self.flush_rows = flush_rows
+        self.max_batch = max_batch
+        self.interval = interval
+        self.spill_path = spill_path
+        self.flushed = 0
+        self.failed_flushes = 0
+        self.last_flush_ms = None
+        self._pending = OrderedDict()
+        self._oldest = None  # monotonic time the oldest pending row arrived
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()  # one batch in flight at a time
+        self._closed = False
+        self._spill = None
+        self._lock_file = None
+        if spill_path:
+            self.spill_path = _process_path(spill_path)
+            os.makedirs(os.path.dirname(os.path.abspath(self.spill_path)), exist_ok=True)
+            self._lock_file = _try_lock(self.spill_path)
+            self._replay(spill_path)
+            self._spill = open(self.spill_path, "a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def _replay(self, base_path):
+        """Take over rows spilled by this or earlier processes that never reached the database."""
+        claimed = []
+        for path in _spill_files(base_path):
+            if path != self.spill_path:
+                lock = _try_lock(path)
+                if lock is None:
+                    continue  # a live process owns it (or, without fcntl, there is no telling)
+                claimed.append((path, lock))
+            for row in _read_spill(path):
+                self._pending[row_key(row)] = row
+        if self._pending:
+            self._oldest = time.monotonic()
+            print(f"♻️ Recovered {len(self._pending)} unsaved weather rows from {os.path.dirname(self.spill_path)}")
+        # Our file holds every claimed row before the orphans are removed
+        self._rewrite_spill()
+        for path, lock in claimed:
+            _remove_spill(path, lock)
+
+    def _rewrite_spill(self):
+        """Replace the spill file with the rows still pending (caller holds the condition lock)."""
+        if self._spill:
+            self._spill.close()
+        tmp = self.spill_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for row in self._pending.values():
+                f.write(json.dumps(row, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.spill_path)
+        if self._spill:
+            self._spill = open(self.spill_path, "a", encoding="utf-8")
+
+    def put(self, row):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("write-behind queue is closed")
+            key = row_key(row)
+            self._pending.pop(key, None)
+            self._pending[key] = row
+            first = self._oldest is None
+            if first:
+                self._oldest = time.monotonic()
+            if self._spill:
+                self._spill.write(json.dumps(row, default=str) + "\n")
+                self._spill.flush()
+            depth = len(self._pending)
+            if first or depth >= self.max_batch:
+                self._cond.notify()  # start the interval timer, or flush a full batch now
+        metrics.set_gauge("write_behind_depth", depth)
+
+    def depth(self):
+        with self._cond:
+            return len(self._pending)
+
+    def flush(self):
+        """Push everything pending now. Returns the number of rows written; raises if the write fails."""
+        with self._flush_lock:
+            with self._cond:
+                if not self._pending:
+                    return 0
+                batch = self._pending
+                self._pending = OrderedDict()
+                self._oldest = None
+
+            start = time.perf_counter()
+            try:
+                self.flush_rows(list(batch.values()))
+            except Exception:
+                elapsed = time.perf_counter() - start
+                with self._cond:
+                    # Put the batch back in front; rows queued meanwhile are newer and win
+                    batch.update(self._pending)
+                    self._pending = batch
+                    self._oldest = time.monotonic()
+                    depth = len(self._pending)
+                self.failed_flushes += 1
+                metrics.record("write_behind.flush", elapsed, error=True)
+                metrics.set_gauge("write_behind_depth", depth)
+                raise
+            elapsed = time.perf_counter() - start
+
+            with self._cond:
+                if self._spill:
+                    self._rewrite_spill()
+                depth = len(self._pending)
+            self.flushed += len(batch)
+            self.last_flush_ms = round(elapsed * 1000, 3)
+            metrics.record("write_behind.flush", elapsed)
+            metrics.set_gauge("write_behind_depth", depth)
+            return len(batch)
+
+    def _due(self):
+        return bool(self._pending) and (
+            len(self._pending) >= self.max_batch or time.monotonic() - self._oldest >= self.interval
+        )
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed and not self._due():
+                    timeout = None
+                    if self._oldest is not None:
+                        timeout = max(self.interval - (time.monotonic() - self._oldest), 0.01)
+                    self._cond.wait(timeout)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️ Write-behind flush failed, will retry: {e}")
+                time.sleep(min(self.interval, 5))
+
+    def stats(self):
+        with self._cond:
+            depth = len(self._pending)
+        return {
+            "depth": depth,
+            "flushed": self.flushed,
+            "failed_flushes": self.failed_flushes,
+            "last_flush_ms": self.last_flush_ms,
+        }
+
+    def close(self):
+        """Stop the background thread and make a final flush; unflushed rows stay in the spill file."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"⚠️ Write-behind flush failed, {self.depth()} rows kept in {self.spill_path}: {e}")
+        with self._cond:
+            if self._spill:
+                self._spill.close()
+                self._spill = None
+                if not self._pending:
+                    _remove_spill(self.spill_path, self._lock_file)
+                elif self._lock_file:
+                    self._lock_file.close()  # releases the lock, so the next process claims the rows
+                self._lock_file = None